@@ -0,0 +1,319 @@
+"""
+Headless HTTP API for AI Copilot.
+A dependency-free ASGI app exposing the same ConversationManager + LLMClient
+pipeline as the Gradio UI, with JSON requests, SSE streaming and server-side
+sessions (the client only sends its session_id, never the transcript).
+A new message on a session cancels that session's pending one (409), and a
+client disconnect cancels its own request (services/cancel.py). A session
+held by another worker's turn (shared store) is also a 409.
+
+Endpoints:
+    GET    /health                 -> status, sessions, LLM metrics (this worker
+                                      and, with a shared store, all workers),
+                                      token usage by intent/model and prompt growth
+    POST   /v1/sessions            -> {"session_id"}
+    DELETE /v1/sessions/{id}
+    POST   /v1/chat                -> {"session_id", "request_id", "intent", "output", "turn"}
+    POST   /v1/chat/stream         -> text/event-stream: meta, delta..., done
+                                      (or cancelled)
+
+Run from the repo root (uvicorn ships with Gradio):
+    uvicorn app.api:app --port 8000
+or with several worker processes sharing sessions and metrics:
+    python -m app.serve --workers 4
+"""
+
+import asyncio
+import json
+import os
+import uuid
+
+from services.cancel import CancelRegistry, CancelToken
+from services.chat import (get_llm, llm_metrics, llm_snapshot, llm_usage_report, preload_intents,
+                           run_turn)
+from services.prefetch import get_prefetcher
+from services.sessions import SessionStore
+from services.store import SessionBusy, SQLiteMetricsCollector, SQLiteSessionStore
+from services.telemetry import get_logger
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class CopilotAPI:
+    def __init__(self, store: SessionStore = None, llm_factory=get_llm, logger=None,
+                 collector: SQLiteMetricsCollector = None, prefetcher=None):
+        self.store = store if store is not None else SessionStore()
+        self.llm_factory = llm_factory
+        self.logger = logger or get_logger()
+        self.collector = collector
+        self.prefetcher = prefetcher or get_prefetcher()
+        self.cancels = CancelRegistry()
+
+
+    """ASGI entry point."""
+    async def __call__(self, scope, receive, send):
+        match scope["type"]:
+            case "lifespan":
+                await self._lifespan(receive, send, self.collector)
+                return
+            case "http":
+                pass
+            case _:
+                return
+
+        method = scope["method"]
+        path = scope["path"].rstrip("/") or "/"
+        try:
+            match (method, path):
+                case ("GET", "/health"):
+                    health = {
+                        "status": "ok",
+                        "worker": os.getpid(),
+                        "sessions": await asyncio.to_thread(len, self.store),
+                        "llm": llm_metrics(),
+                        "usage": llm_usage_report(),
+                    }
+                    if self.prefetcher is not None:
+                        health["prefetch"] = self.prefetcher.metrics()
+                    if self.collector is not None:
+                        health["llm_all_workers"] = await asyncio.to_thread(self.collector.aggregate)
+                    await self._json(send, 200, health)
+                case ("POST", "/v1/sessions"):
+                    session_id = await asyncio.to_thread(self.store.create)
+                    await self._json(send, 201, {"session_id": session_id})
+                case ("DELETE", _) if path.startswith("/v1/sessions/"):
+                    session_id = path.rsplit("/", 1)[1]
+                    if not await asyncio.to_thread(self.store.delete, session_id):
+                        raise HTTPError(404, "session not found")
+                    await self._json(send, 200, {"deleted": session_id})
+                case ("POST", "/v1/chat"):
+                    body = await self._read_json(receive)
+                    await self._watched(receive, self._chat, send, *await self._chat_args(body))
+                case ("POST", "/v1/chat/stream"):
+                    body = await self._read_json(receive)
+                    await self._watched(receive, self._chat_stream, send,
+                                        *await self._chat_args(body))
+                case _:
+                    raise HTTPError(404, "not found")
+        except HTTPError as e:
+            await self._json(send, e.status, {"error": e.detail})
+
+
+    """
+    Validates a chat body. A missing session_id starts a new session; an
+    unknown one (expired or deleted) is a 404. Store calls run in a thread:
+    with a shared store they are SQLite queries that may wait on a lock.
+    """
+    async def _chat_args(self, body):
+        message = body.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, "'message' must be a non-empty string")
+
+        session_id = body.get("session_id")
+        if session_id is None:
+            session_id = await asyncio.to_thread(self.store.create)
+        elif (not isinstance(session_id, str)
+                or not await asyncio.to_thread(self.store.exists, session_id)):
+            raise HTTPError(404, "session not found")
+        return session_id, message
+
+    """
+    Runs a chat handler with a CancelToken that is set if the client
+    disconnects (after the body is read, the next ASGI message is
+    http.disconnect).
+    """
+    async def _watched(self, receive, handler, send, session_id: str, message: str):
+        cancel = CancelToken()
+
+        async def watch():
+            while True:
+                if (await receive())["type"] == "http.disconnect":
+                    cancel.cancel("disconnected")
+                    return
+
+        watcher = asyncio.create_task(watch())
+        try:
+            await handler(send, session_id, message, cancel)
+        finally:
+            watcher.cancel()
+
+    async def _chat(self, send, session_id: str, message: str, cancel: CancelToken = None):
+        request_id = uuid.uuid4().hex[:8]
+        span = self.logger.span(request_id)
+
+        def turn():
+            with (span.track(), self.cancels.request(session_id, cancel) as token,
+                  self.store.session(session_id) as conv):
+                intent, output = run_turn(conv, message, span, self.llm_factory,
+                                          prefetcher=self.prefetcher, cancel=token)
+                return intent, output, conv.turn_count, token
+
+        try:
+            intent, output, turn_now, token = await asyncio.to_thread(turn)
+        except SessionBusy:
+            raise HTTPError(409, "session is busy")
+        #A slow request writes its profile capture here, off the event loop
+        await asyncio.to_thread(span.end, turn=turn_now, api=True)
+        if output is None and token.cancelled:
+            raise HTTPError(409, f"request cancelled ({token.reason})")
+        await self._json(send, 200, {
+            "session_id": session_id,
+            "request_id": request_id,
+            "intent": intent,
+            "output": output,
+            "turn": turn_now,
+        })
+
+
+    """
+    Streams one turn as Server-Sent Events. The blocking pipeline and LLM
+    stream run in a worker thread and hand events to the event loop.
+    The `done` event carries the authoritative final output. The response
+    starts with the first event, so a busy session is still a plain 409.
+    """
+    async def _chat_stream(self, send, session_id: str, message: str,
+                           cancel: CancelToken = None):
+        request_id = uuid.uuid4().hex[:8]
+        span = self.logger.span(request_id)
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def emit(event, data):
+            loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+        def turn():
+            try:
+                with (span.track(), self.cancels.request(session_id, cancel) as token,
+                      self.store.session(session_id) as conv):
+                    intent, output = run_turn(
+                        conv, message, span, self.llm_factory, prefetcher=self.prefetcher,
+                        cancel=token, on_delta=lambda text: emit("delta", {"text": text}),
+                        on_intent=lambda intent: emit("meta", {
+                            "session_id": session_id, "request_id": request_id,
+                            "intent": intent}),
+                    )
+                    if output is None:
+                        emit("cancelled", {"reason": token.reason})
+                    else:
+                        emit("done", {"output": output, "turn": conv.turn_count})
+                    span.end(turn=conv.turn_count, api=True, stream=True)
+            except SessionBusy:
+                emit("busy", {"error": "session is busy"})
+            except Exception as e:
+                span.log("stream_error", level="error", error=type(e).__name__)
+                emit("error", {"error": "internal error"})
+            finally:
+                emit(None, None)
+
+        worker = asyncio.create_task(asyncio.to_thread(turn))
+        event, data = await events.get()
+        if event == "busy":
+            await worker
+            raise HTTPError(409, data["error"])
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        while event is not None:
+            if event == "busy":
+                event = "error"    # lease lost after the stream started
+            frame = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+            await send({"type": "http.response.body", "body": frame.encode(), "more_body": True})
+            event, data = await events.get()
+        await worker
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+    async def _read_json(self, receive) -> dict:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise HTTPError(400, "client disconnected")
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, "request body too large")
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        try:
+            body = json.loads(b"".join(chunks) or b"{}")
+        except ValueError:
+            raise HTTPError(400, "invalid JSON body")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "JSON body must be an object")
+        return body
+
+    @staticmethod
+    async def _json(send, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _lifespan(receive, send, collector):
+        while True:
+            message = await receive()
+            match message["type"]:
+                case "lifespan.startup":
+                    if collector is not None:
+                        collector.start()
+                    preload_intents()
+                    await send({"type": "lifespan.startup.complete"})
+                case "lifespan.shutdown":
+                    if collector is not None:
+                        await asyncio.to_thread(collector.stop)
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+
+"""
+Builds the API from the environment. With COPILOT_STATE_DB set, sessions
+and LLM metrics live in that SQLite file so every worker process shares
+them (required when running more than one worker).
+"""
+def create_app() -> CopilotAPI:
+    state_db = os.getenv("COPILOT_STATE_DB")
+    if not state_db:
+        return CopilotAPI()
+
+    return CopilotAPI(
+        store=SQLiteSessionStore(state_db, ttl_secs=float(os.getenv("SESSION_TTL_SECS", "3600"))),
+        collector=SQLiteMetricsCollector(
+            state_db, source=llm_snapshot,
+            interval_secs=float(os.getenv("METRICS_FLUSH_SECS", "5")),
+        ),
+    )
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import os
+    import uvicorn
+
+    uvicorn.run("app.api:app", host=os.getenv("API_HOST", "127.0.0.1"),
+                port=int(os.getenv("API_PORT", "8000")))
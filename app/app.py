@@ -12,20 +12,16 @@ import sys
 
 
 #Dependencies
-import gradio as gr
+# Gradio and the Groq client are only loaded when first needed, so importing
+# this module (tests, API, benchmarks) does not pay for the web stack.
 import uuid 
-from datetime import datetime
 from core.conversation import ConversationManager
-from core.prompting import build_messages
-from services.llm import LLMClient
+from services.cancel import CancelRegistry
+from services.chat import llm_metrics, llm_usage_report, preload_intents, run_turn
+from services.telemetry import get_logger
 
-#Logger 
-def log(event:str, request_id: str, extra: str= ""):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"{timestamp} | {event.upper()} | req={request_id} | {extra}") 
-
-# Initialize the global LLM client
-llm = LLMClient()
+#Logger (queue-backed JSON lines, written off the request path)
+logger = get_logger()
 
 #Welcome message
 WELCOME = """
@@ -42,137 +38,157 @@ Funciones disponibles:
 """
 
 
-def chat_fn(user_input, chat_history, conv_state):
+#Messages rendered in the chat view; "load older" extends it by the same amount
+VIEW_WINDOW= 20
+
+#Pending turn per browser session: a new message or closing the tab cancels it
+active_turns= CancelRegistry()
+
+
+"""
+Chat view for a window of the server-side transcript: only the latest
+`window` messages are sent to the browser, with the welcome bubble once the
+window reaches the start of the conversation.
+"""
+def render_view(conv_state, window: int):
+    view= []
+    has_older= False
+    if conv_state is not None:
+        turns, has_older= conv_state.transcript_window(window)
+        view= [{"role": t.role, "content": t.content} for t in turns]
+    if not has_older:
+        view.insert(0, {"role": "assistant", "content": WELCOME})
+    return view
+
+
+def chat_fn(user_input, conv_state, window=None, cancel_key=None):
     """
     Gradio chat handler.
-    Must return:
-    - chat_history: a list of dicts: {"role": "...", "content": "..."}
+    The transcript lives in conv_state (server-side), so the browser only
+    sends the new message. Must return:
+    - the chat view: a list of dicts: {"role": "...", "content": "..."}
     - conv_state: the updated ConversationManager
+    - the view window (kept as "load older" left it, VIEW_WINDOW by default)
+    cancel_key identifies the browser session (defaults to the conversation's
+    session_id); a newer message on the same key cancels this one.
     """
     request_id= uuid.uuid4().hex[:8]
+    span= logger.span(request_id)
 
     # Start a new session if needed
     if conv_state is None:
         conv_state= ConversationManager()
-    if chat_history is None:
-        chat_history= []
+    window= window or VIEW_WINDOW
     
 
-    # Run conversation pipeline
-    intent, prompt_key, history_for_llm, payload = conv_state.pipeline(user_input)
-    #Log detected intent
-    log("intent", request_id, f"Intent resolved: {intent}")
-
-
-
-    #Intent handling 
-    match intent: 
-        case "BLOCKED":
-            assistant_output= payload  #NEVER calls the LLM
-            log("guardrail", request_id, f"Blocked unsafe input: '{user_input}'")
-        case "SUGGESTION":
-            assistant_output= payload 
-        case "LIMIT_REACHED":
-            assistant_output= payload 
-            log("limit", request_id, "Conversation reset due to turn limit")
-        #Normal flow
-        case _:
-            # Build LLM messages
-            messages = build_messages(prompt_key, history_for_llm, user_input)
-            # Send request to Groq
-            assistant_output = llm.generate(messages)
-
-            #Fallback
-            if (assistant_output is None or "Hubo un problema al conectarme" in assistant_output):
-                log("fallback", request_id, "LLM service unavailable")
-                assistant_output = (
-                    "⚠️ *Modo fallback activado*\n\n"
-                    "Hubo un problema al conectarme con el modelo. "
-                    "Por favor, intenta nuevamente en unos momentos."
-                )
-
-
-
-    # Update internal conversation state
-    conv_state.update_state(user_input, assistant_output)
-
-    #Turn counter per interaction
-    turn_now = conv_state.turn_count
-    turn_indicator = f"[Turno {turn_now}/{conv_state.max_turns}]\n\n"
-
-    #Warning if close to session limit
-    remaining= conv_state.max_turns - turn_now
-    limit_warning= (f"Quedan {remaining} turnos antes de reiniciar la sesión.\n\n"
-        if remaining <= 3 else "")
-    
-    final_output = turn_indicator + limit_warning + assistant_output
+    # Run conversation pipeline + LLM call (shared with the HTTP API)
+    with span.track(), active_turns.request(cancel_key or conv_state.session_id) as cancel:
+        intent, final_output = run_turn(conv_state, user_input, span, cancel=cancel)
+
+    #Superseded or abandoned: nothing was stored, the view is left as it was
+    if final_output is None:
+        span.end(turn=conv_state.turn_count)
+        return render_view(conv_state, window), conv_state, window
 
+    conv_state.record_transcript(user_input, final_output)
 
-    # Append user + assistant messages in dict format
-    chat_history.append({"role": "user", "content": user_input})
-    chat_history.append({"role": "assistant", "content": final_output})
+    span.end(turn=conv_state.turn_count)
+    return render_view(conv_state, window), conv_state, window
 
-    return chat_history, conv_state
 
+"""Extends the chat view with the previous VIEW_WINDOW messages."""
+def load_older(conv_state, window):
+    window= (window or VIEW_WINDOW) + VIEW_WINDOW
+    return render_view(conv_state, window), window
 
-#Gradio Interface
-with gr.Blocks(title="AI Copilot") as interface:
 
-    gr.Markdown("## 🤖 AI Copilot")
+#Gradio Interface (built on demand, see build_interface)
+def build_interface():
+    import gradio as gr
 
-    gr.HTML("""
-    <style>
-        .send-btn button {
-            height: 48px !important;
-            border-radius: 10px !important;
-            font-size: 20px !important;
-            padding: 0 18px !important;
-        }
-        .gr-textbox input {
-            height: 48px !important;
-            border-radius: 10px !important;
-            font-size: 16px !important;
-        }
-    </style>
-    """)
+    with gr.Blocks(title="AI Copilot") as interface:
 
-    # Persistent conversation state
-    conv_state = gr.State()
+        gr.Markdown("## 🤖 AI Copilot")
 
+        gr.HTML("""
+        <style>
+            .send-btn button {
+                height: 48px !important;
+                border-radius: 10px !important;
+                font-size: 20px !important;
+                padding: 0 18px !important;
+            }
+            .gr-textbox input {
+                height: 48px !important;
+                border-radius: 10px !important;
+                font-size: 16px !important;
+            }
+        </style>
+        """)
 
-    #Chatbot starts with welcome bubble
-    chatbot= gr.Chatbot(
-        value= [{"role": "assistant", "content": WELCOME}],
-        height= 550,
-    )
+        # Persistent conversation state (holds the transcript, never sent to the browser)
+        conv_state = gr.State()
+        view_window = gr.State(VIEW_WINDOW)
 
-    with gr.Row(equal_height=True):
-        user_input = gr.Textbox(
-            placeholder="Escribe un mensaje...",
-            show_label=False,
-            scale=9,
-            container=False,
+        older_button = gr.Button("Cargar mensajes anteriores", size="sm")
+
+
+        #Chatbot starts with welcome bubble
+        chatbot= gr.Chatbot(
+            value= [{"role": "assistant", "content": WELCOME}],
+            height= 550,
         )
 
-        send_button = gr.Button(
-            "➤",
-            scale=1,
-            min_width=60,
-            elem_classes="send-btn",
+        with gr.Row(equal_height=True):
+            user_input = gr.Textbox(
+                placeholder="Escribe un mensaje...",
+                show_label=False,
+                scale=9,
+                container=False,
+            )
+
+            send_button = gr.Button(
+                "➤",
+                scale=1,
+                min_width=60,
+                elem_classes="send-btn",
+            )
+
+        # The browser session keys cancellation: a new message supersedes the
+        # pending one, so events must not queue behind each other
+        def submit(text, state, window, request: gr.Request):
+            return chat_fn(text, state, window, cancel_key=request.session_hash)
+
+        send_button.click(
+            submit,
+            inputs=[user_input, conv_state, view_window],
+            outputs=[chatbot, conv_state, view_window],
+            concurrency_limit=None,
+            trigger_mode="multiple",
         )
 
-    send_button.click(
-        chat_fn,
-        inputs=[user_input, chatbot, conv_state],
-        outputs=[chatbot, conv_state]
-    )
+        # Also send message by pressing Enter
+        user_input.submit(
+            submit,
+            inputs=[user_input, conv_state, view_window],
+            outputs=[chatbot, conv_state, view_window],
+            concurrency_limit=None,
+            trigger_mode="multiple",
+        )
 
-    # Also send message by pressing Enter
-    user_input.submit(
-        chat_fn,
-        inputs=[user_input, chatbot, conv_state],
-        outputs=[chatbot, conv_state]
-    )
+        older_button.click(
+            load_older,
+            inputs=[conv_state, view_window],
+            outputs=[chatbot, view_window]
+        )
+
+        # Closing the tab abandons the pending turn (Gradio versions with unload)
+        if hasattr(interface, "unload"):
+            def on_close(request: gr.Request):
+                active_turns.cancel(request.session_hash, "disconnected")
+            interface.unload(on_close)
+
+    return interface
 
 
 """
@@ -183,11 +199,18 @@ When running locally:
     - Metrics are NOT printed (interactive=True)
     """
 if __name__ == "__main__":
+    preload_intents()
     try:
-        interface.launch()
+        build_interface().launch()
     finally:
         if not os.environ.get("HF_SPACE_ID"):
             print("\n=== LLM METRICS REPORT (LOCAL ONLY) ===")
-            for k, v in llm.metrics().items():
+            for k, v in llm_metrics().items():
+                print(f"{k}: {v}")
+            print("\n=== TOKEN USAGE (by intent / model, prompt growth) ===")
+            for k, v in llm_usage_report().items():
                 print(f"{k}: {v}")
+            logger.flush()
+            for k, v in logger.stats().items():
+                print(f"log_{k}: {v}")
 
@@ -0,0 +1,34 @@
+"""
+Multi-worker entry point for the HTTP API.
+Starts N uvicorn worker processes on one port. Sessions and LLM metrics are
+kept in a shared SQLite (WAL) file so any worker can serve any session and
+/health reports totals across workers.
+
+    python -m app.serve --workers 4 --port 8000 --state-db copilot_state.db
+
+The Gradio UI (app/app.py) keeps its sessions in gr.State and still runs as
+a single process.
+"""
+
+import argparse
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the AI Copilot HTTP API")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "1")))
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--state-db", default=os.getenv("COPILOT_STATE_DB", "copilot_state.db"),
+                        help="SQLite file shared by the workers")
+    args = parser.parse_args()
+
+    # Workers are separate processes that build the app from the environment
+    os.environ["COPILOT_STATE_DB"] = os.path.abspath(args.state_db)
+
+    import uvicorn
+    uvicorn.run("app.api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/bench_history.py
+"""
+Allocation and memory benchmark for the conversation history.
+
+Compares the previous implementation (list of dicts re-sliced on every
+update, dict rebuilt per turn in build_messages) against the ring buffer of
+slotted Turn objects. Expect about half the memory per session (a Turn is
+two slots, not a dict) for 1-2 us more per request (two Turns are built
+per update, and build_messages turns them into dicts).
+
+Run from the repo root:
+    python -m benchmarks.bench_history
+"""
+
+import time
+import tracemalloc
+
+from core.conversation import ConversationManager
+from core.history import Turn, TurnBuffer
+from core.prompting import SYSTEM_PROMPTS, build_messages
+
+REQUESTS = 2000
+SESSIONS = 200
+TURNS_PER_SESSION = 20
+
+
+#Previous implementation, kept here only as the baseline
+class LegacyHistory:
+    context_window = 5
+
+    def __init__(self):
+        self.history = []
+
+    def update_state(self, user_text, assistant_text):
+        self.history.append({"role": "user", "content": user_text})
+        self.history.append({"role": "assistant", "content": assistant_text})
+        if len(self.history) > self.context_window * 2:
+            self.history = self.history[- self.context_window * 2:]
+
+    def snapshot(self):
+        return self.history.copy()
+
+
+def legacy_build_messages(prompt_key, history, user_input):
+    prompt = SYSTEM_PROMPTS.get(prompt_key, SYSTEM_PROMPTS["SP_DEFAULT"])
+    messages = [{"role": "system", "content": prompt}]
+    for turn in history:
+        messages.append({"role": turn["role"], "content": turn["content"]})
+    messages.append({"role": "user", "content": user_input})
+    return messages
+
+
+class CurrentHistory:
+    def __init__(self):
+        self.history = TurnBuffer(ConversationManager.context_window * 2)
+
+    def update_state(self, user_text, assistant_text):
+        self.history.append(Turn("user", user_text))
+        self.history.append(Turn("assistant", assistant_text))
+
+    def snapshot(self):
+        return self.history.snapshot()
+
+
+def per_request(factory, build):
+    """
+    Peak bytes allocated (under tracemalloc) and wall time (in a separate,
+    untraced run) for one update + build cycle.
+    """
+    session = factory()
+    for i in range(TURNS_PER_SESSION):
+        session.update_state(f"mensaje del usuario {i}", f"respuesta del asistente {i}")
+    inputs = [(f"mensaje {i}", f"respuesta {i}", f"entrada {i}") for i in range(REQUESTS)]
+
+    tracemalloc.start()
+    peaks = 0
+    for user, answer, text in inputs:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        session.update_state(user, answer)
+        build("SP_DEFAULT", session.snapshot(), text)
+        peaks += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for user, answer, text in inputs:
+            session.update_state(user, answer)
+            build("SP_DEFAULT", session.snapshot(), text)
+        best = min(best, time.perf_counter() - start)
+    return peaks / REQUESTS, best / REQUESTS * 1e6
+
+
+def per_session(factory):
+    """Bytes retained per session after TURNS_PER_SESSION turns."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    sessions = []
+    for _ in range(SESSIONS):
+        s = factory()
+        for i in range(TURNS_PER_SESSION):
+            s.update_state(f"mensaje del usuario {i}", f"respuesta del asistente {i}")
+        sessions.append(s)
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return retained / SESSIONS
+
+
+def main():
+    rows = [
+        ("legacy (list + dicts)", LegacyHistory, legacy_build_messages),
+        ("ring buffer + Turn", CurrentHistory, build_messages),
+    ]
+    print(f"{'variant':<24}{'peak B/request':>16}{'us/request':>12}{'B/session':>12}")
+    for name, factory, build in rows:
+        peak, us = per_request(factory, build)
+        mem = per_session(factory)
+        print(f"{name:<24}{peak:>16.0f}{us:>12.2f}{mem:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_import.py
+"""
+Bulk import benchmark.
+
+Writes a synthetic JSONL export (notes and reminders, with some invalid
+rows) and imports it into a fresh SQLite file, reporting throughput and
+peak Python memory (tracemalloc, measured on a separate run so it does not
+slow the timed one) for growing file sizes. Peak memory should not grow
+with the number of rows.
+
+Run from the repo root:
+    python -m benchmarks.bench_import [--rows 100000] [--batch-size 1000]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+
+from services.importer import import_file
+from services.store import SQLiteNotesStore
+
+MONTHS = ["enero", "marzo", "junio", "septiembre", "diciembre"]
+
+
+def write_export(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(rows):
+            r = rng.random()
+            if r < 0.6:
+                row = {"type": "note", "text": f"Idea número {i}: revisar el capítulo {i % 40}"}
+            elif r < 0.95:
+                row = {"type": "reminder",
+                       "text": f"Pagar la factura {i} el {rng.randint(1, 28)} de "
+                               f"{rng.choice(MONTHS)} de 2099"}
+            else:
+                row = {"type": "reminder", "text": f"Llamar a Ana ({i})"}    # no date
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def run(rows, batch_size):
+    """Timed import, then a second one under tracemalloc for the peak."""
+    with tempfile.TemporaryDirectory() as tmp:
+        export = os.path.join(tmp, "export.jsonl")
+        write_export(export, rows)
+        stats = import_file(export, SQLiteNotesStore(os.path.join(tmp, "timed.db")),
+                            batch_size=batch_size)
+
+        tracemalloc.start()
+        import_file(export, SQLiteNotesStore(os.path.join(tmp, "traced.db")),
+                    batch_size=batch_size)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return stats, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}{'imported':>10}{'skipped':>9}{'secs':>8}{'rows/s':>10}{'peak KiB':>10}")
+    for rows in sorted({args.rows // 100, args.rows // 10, args.rows}):
+        stats, peak = run(rows, args.batch_size)
+        d = stats.as_dict()
+        print(f"{rows:>9,}{d['imported']:>10,}{d['skipped']:>9,}{d['elapsed_secs']:>8.2f}"
+              f"{d['rows_per_sec']:>10,.0f}{peak / 1024:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_intent.py
+"""
+Latency and accuracy of the slash-command suggestion: previous keyword
+heuristics vs the hashed n-gram classifier (core/intent.py), on the held-out
+set in benchmarks/data/intents_eval.jsonl (not used for training).
+
+"false suggestions" counts inputs labeled NONE that would still trigger a
+suggestion, which costs the user an extra turn.
+
+Run from the repo root:
+    python -m benchmarks.bench_intent
+"""
+
+import json
+import os
+import time
+
+from core.conversation import ConversationManager
+from core.intent import DEFAULT_TRAINING_DATA, IntentClassifier
+
+EVAL_DATA = os.path.join(os.path.dirname(__file__), "data", "intents_eval.jsonl")
+REPEAT = 200
+
+
+#Previous keyword heuristics, kept here only as the baseline.
+#Returns the first matching intent in the order they were checked.
+def legacy_intent(text):
+    t = text.lower()
+    if any(kw in t for kw in ["nota", "apuntar", "escribe", "escribir", "apúntame", "anotar"]):
+        return "NOTE"
+    if any(kw in t for kw in ["recordatorio", "recordar", "recuérdame", "avísame", "no olvidar"]):
+        return "REMINDER"
+    if any(kw in t for kw in ["buscar", "investigar", "averiguar", "información sobre", "dime sobre"]):
+        return "SEARCH"
+    if ("nota" in t) and any(kw in t for kw in ["ver", "mostrar", "muéstrame"]):
+        return "VIEWNOTE"
+    if any(kw in t for kw in ["ver agenda", "mostrar agenda", "agenda", "qué tengo pendiente"]):
+        return "AGENDA"
+    return "NONE"
+
+
+def score(predicted, labels):
+    correct = sum(p == l for p, l in zip(predicted, labels))
+    none_total = sum(l == "NONE" for l in labels)
+    false_suggestions = sum(p != "NONE" and l == "NONE" for p, l in zip(predicted, labels))
+    return correct / len(labels), false_suggestions, none_total
+
+
+def timed_us(fn, texts):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (REPEAT * len(texts)) * 1e6
+
+
+def main():
+    with open(EVAL_DATA, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    texts = [r["text"] for r in rows]
+    labels = [r["intent"] for r in rows]
+
+    start = time.perf_counter()
+    clf = IntentClassifier.from_jsonl(DEFAULT_TRAINING_DATA)
+    train_ms = (time.perf_counter() - start) * 1000
+
+    threshold = ConversationManager.suggestion_threshold
+    def classifier_intent(text):
+        intent, confidence = clf.predict(text)
+        return intent if confidence >= threshold else "NONE"
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        clf.predict_batch(texts)
+    batch_us = (time.perf_counter() - start) / (REPEAT * len(texts)) * 1e6
+
+    print(f"eval set: {len(rows)} inputs, classifier trained in {train_ms:.0f} ms\n")
+    print(f"{'variant':<22}{'accuracy':>10}{'false sugg.':>13}{'us/input':>10}")
+    for name, fn in [("keyword heuristics", legacy_intent), ("n-gram classifier", classifier_intent)]:
+        accuracy, false_sugg, none_total = score([fn(t) for t in texts], labels)
+        print(f"{name:<22}{accuracy:>10.1%}{f'{false_sugg}/{none_total}':>13}{timed_us(fn, texts):>10.1f}")
+    print(f"{'classifier (batch)':<22}{'':>10}{'':>13}{batch_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_recall.py
+"""
+Long-term recall benchmark.
+
+For sessions of growing length, compares sending the whole past history
+(the only way to keep old turns visible without recall) against the context
+window + top-k BM25 recall: prompt size (estimated tokens), the time to
+index one exchange and build the messages for one turn, and the time of one
+turn through SQLiteSessionStore (load + save of the session), which must
+not grow with the session's length.
+
+Run from the repo root:
+    python -m benchmarks.bench_recall
+"""
+
+import os
+import random
+import tempfile
+import time
+
+from core.conversation import ConversationManager
+from core.prompting import build_messages
+from services.store import SQLiteSessionStore
+from services.usage import estimate_tokens
+
+SESSION_LENGTHS = (10, 50, 200, 500, 2000)
+TOPICS = ["perro", "viaje", "examen", "receta", "película", "presupuesto", "gimnasio",
+          "cumpleaños", "proyecto", "libro", "música", "clima", "trabajo", "jardín"]
+
+
+#Filler vocabulary, so topic words are not in every answer
+VOCABULARY = [f"palabra{i}" for i in range(3000)]
+
+
+def make_exchange(rng, i):
+    topic, other = rng.sample(TOPICS, 2)
+    user = f"Hablemos de mi {topic} número {i}, relacionado con {other}"
+    answer = f"Claro, sobre tu {topic}: " + " ".join(rng.choices(VOCABULARY, k=40))
+    return user, answer
+
+
+def bench(length, queries=200):
+    rng = random.Random(length)
+    conv = ConversationManager()
+    full_history = []
+    for i in range(length):
+        user, answer = make_exchange(rng, i)
+        conv.update_state(user, answer)
+        full_history += [{"role": "user", "content": user},
+                         {"role": "assistant", "content": answer}]
+
+    query = "¿qué te dije sobre mi perro y el viaje?"
+    full_tokens = estimate_tokens(build_messages("SP_DEFAULT", full_history, query))
+    recall_messages = build_messages("SP_DEFAULT", conv.history.snapshot(), query,
+                                     conv.recall, conv.recall_top_k)
+    recall_tokens = estimate_tokens(recall_messages)
+
+    start = time.perf_counter()
+    for i in range(queries):
+        build_messages("SP_DEFAULT", conv.history.snapshot(), query, conv.recall,
+                       conv.recall_top_k)
+    build_us = (time.perf_counter() - start) / queries * 1e6
+
+    start = time.perf_counter()
+    for i in range(queries):
+        conv.recall.add(*make_exchange(rng, length + i))
+    add_us = (time.perf_counter() - start) / queries * 1e6
+    return full_tokens, recall_tokens, build_us, add_us
+
+
+"""Average ms of one stored turn once the session holds `length` exchanges."""
+def bench_store(length, turns=20):
+    rng = random.Random(length)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteSessionStore(os.path.join(tmp, "state.db"))
+        session_id = store.create()
+        with store.session(session_id) as conv:
+            for i in range(length):
+                conv.update_state(*make_exchange(rng, i))
+
+        start = time.perf_counter()
+        for i in range(turns):
+            with store.session(session_id) as conv:
+                conv.update_state(*make_exchange(rng, length + i))
+        return (time.perf_counter() - start) / turns * 1000
+
+
+def main():
+    print(f"{'exchanges':>10}{'full-history tok':>18}{'window+recall tok':>19}"
+          f"{'build µs':>11}{'index µs':>11}{'store turn ms':>15}")
+    for length in SESSION_LENGTHS:
+        full, recall, build_us, add_us = bench(length)
+        store_ms = bench_store(length)
+        print(f"{length:>10}{full:>18,}{recall:>19,}{build_us:>11.1f}{add_us:>11.1f}"
+              f"{store_ms:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start benchmark.
+
+1. Import time per entry module, measured with `python -X importtime`,
+   checked against a budget (exit code 1 if any module is over it).
+2. Time-to-first-served-request: wall time from process spawn until
+   chat_fn has answered one message, either a slash-command or plain text
+   (plain text goes through the intent classifier first). The LLM is replaced by an in-process
+   echo client so only startup cost is measured, not network latency.
+   The "eager" row also imports Gradio and the Groq SDK up front, like the
+   previous module layout did (skipped when they are not installed).
+
+Run from the repo root:
+    python -m benchmarks.bench_startup [--budget-ms 150] [--runs 5]
+"""
+
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["core.conversation", "core.prompting", "services.llm", "app.app"]
+
+FIRST_REQUEST = """
+import app.app as web
+import services.chat as chat
+
+class EchoClient:
+    def generate(self, messages, **kwargs):
+        return messages[-1]["content"]
+
+chat._llm = EchoClient()
+history, state, _ = web.chat_fn(MESSAGE, None)
+assert history[-1]["role"] == "assistant"
+print("served", flush=True)
+"""
+
+FIRST_MESSAGES = [
+    ("command", "/busqueda capital de Francia"),
+    ("plain text", "quiero que me recuerdes pagar la luz"),
+]
+
+EAGER_IMPORTS = "import gradio\nfrom groq import Groq\n"
+
+
+def import_time_ms(module: str) -> float:
+    """Cumulative import time of `module` in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    for line in reversed(proc.stderr.splitlines()):
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    return 0.0
+
+
+def first_request_ms(code: str) -> float:
+    env = dict(os.environ)
+    env.pop("GROQ_API_KEY", None)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                   capture_output=True, text=True, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=150.0,
+                        help="max cumulative import time per module")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    over_budget = False
+    print(f"{'module':<22}{'import ms':>12}{'budget':>10}")
+    for module in MODULES:
+        ms = median([import_time_ms(module) for _ in range(args.runs)])
+        flag = "" if ms <= args.budget_ms else "  OVER"
+        over_budget |= ms > args.budget_ms
+        print(f"{module:<22}{ms:>12.1f}{args.budget_ms:>10.0f}{flag}")
+
+    print()
+    print(f"{'startup':<22}{'first request ms':>18}")
+    for label, message in FIRST_MESSAGES:
+        code = f"MESSAGE = {message!r}\n" + FIRST_REQUEST
+        lazy = median([first_request_ms(code) for _ in range(args.runs)])
+        print(f"{'lazy, ' + label:<22}{lazy:>18.1f}")
+    if importlib.util.find_spec("gradio") and importlib.util.find_spec("groq"):
+        code = f"MESSAGE = {FIRST_MESSAGES[0][1]!r}\n" + EAGER_IMPORTS + FIRST_REQUEST
+        eager = median([first_request_ms(code) for _ in range(args.runs)])
+        print(f"{'eager imports':<22}{eager:>18.1f}")
+    else:
+        print(f"{'eager imports':<22}{'skipped (gradio/groq missing)':>18}")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_transcript.py
+"""
+Per-turn payload and handler-time benchmark for the Gradio chat handler.
+
+Compares the previous handler, which took the whole chatbot transcript as
+an input and returned it as an output, against the server-side transcript
+with a windowed view (app.app.chat_fn). Payload bytes are the JSON of the
+handler's browser-facing inputs + outputs (gr.State values stay on the
+server). Handler time includes decoding the inputs and encoding the outputs,
+the work Gradio does around the call.
+
+The LLM is an in-process echo client, so only the app-side cost is measured.
+
+Run from the repo root:
+    python -m benchmarks.bench_transcript [--turns 40]
+"""
+
+import argparse
+import io
+import json
+import time
+
+import app.app as web
+import services.chat as chat
+from core.conversation import ConversationManager
+from services.chat import run_turn
+from services.telemetry import JSONLogger
+
+ANSWER = "Aquí tienes un resumen breve con los puntos principales. " * 8
+REPORT_TURNS = (1, 10, 20, 30, 40)
+
+
+class EchoClient:
+    max_tokens = 300
+
+    def generate(self, messages, **kwargs):
+        return ANSWER
+
+
+#Previous handler, kept here only as the baseline
+def legacy_chat_fn(user_input, chat_history, conv_state):
+    span = web.logger.span("legacy")
+    if conv_state is None:
+        conv_state = ConversationManager()
+    if chat_history is None:
+        chat_history = []
+    intent, final_output = run_turn(conv_state, user_input, span)
+    chat_history.append({"role": "user", "content": user_input})
+    chat_history.append({"role": "assistant", "content": final_output})
+    span.end(turn=conv_state.turn_count)
+    return chat_history, conv_state
+
+
+def legacy_turn(state, text):
+    history, conv = state
+    inbound = json.dumps([text, history], ensure_ascii=False)
+    start = time.perf_counter()
+    text, history = json.loads(inbound)
+    history, conv = legacy_chat_fn(text, history, conv)
+    outbound = json.dumps(history, ensure_ascii=False)
+    elapsed = (time.perf_counter() - start) * 1000
+    return (history, conv), len(inbound.encode()) + len(outbound.encode()), elapsed
+
+
+def current_turn(state, text):
+    conv, window = state
+    inbound = json.dumps([text], ensure_ascii=False)
+    start = time.perf_counter()
+    (text,) = json.loads(inbound)
+    view, conv, window = web.chat_fn(text, conv, window)
+    outbound = json.dumps(view, ensure_ascii=False)
+    elapsed = (time.perf_counter() - start) * 1000
+    return (conv, window), len(inbound.encode()) + len(outbound.encode()), elapsed
+
+
+def run(turn_fn, state, turns, repeats):
+    """Returns {turn: (payload_bytes, median handler ms)}."""
+    results = {}
+    samples = {t: [] for t in range(1, turns + 1)}
+    for _ in range(repeats):
+        current = state()
+        for t in range(1, turns + 1):
+            current, size, ms = turn_fn(current, f"/busqueda tema número {t}")
+            samples[t].append(ms)
+            results[t] = size
+    return {t: (results[t], sorted(ms)[len(ms) // 2]) for t, ms in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    chat._llm = EchoClient()
+    web.logger = JSONLogger(stream=io.StringIO())
+
+    legacy = run(legacy_turn,
+                 lambda: ([{"role": "assistant", "content": web.WELCOME}], None),
+                 args.turns, args.repeats)
+    current = run(current_turn, lambda: (None, None), args.turns, args.repeats)
+
+    print(f"{'turn':>5}{'legacy bytes':>15}{'legacy ms':>12}{'window bytes':>15}{'window ms':>12}")
+    for t in REPORT_TURNS:
+        if t <= args.turns:
+            print(f"{t:>5}{legacy[t][0]:>15,}{legacy[t][1]:>12.3f}"
+                  f"{current[t][0]:>15,}{current[t][1]:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,102 @@
 
 #Dependencies
 from core.prompting import sanitize_input
+from core.dates import REMINDER_ERRORS, parse_reminder_date
+from core.history import Turn, TurnBuffer
+from core.recall import RecallIndex
 from datetime import datetime
-import re 
-import difflib
+import uuid
 
 
 class ConversationManager: 
     max_turns= 20
     context_window= 5 
+    max_transcript= 200     #messages kept for the chat view (the LLM only sees history)
+    recall_top_k= 3         #past exchanges recalled into the prompt (0 = off)
     def __init__(self): 
-        self.history= []     # [{"user": "...", "assistant": "..."}]
+        self.history= TurnBuffer(self.context_window * 2)     # ring of Turn(role, content)
+        self.transcript= TurnBuffer(self.max_transcript)      # what the UI shows, kept server-side
+        self.transcript_dropped= 0                            # messages evicted from the transcript ring
+        self.recall= RecallIndex()                            # BM25 over every exchange, see core/recall.py
         self.turn_count= 0
+        self.session_id= uuid.uuid4().hex
+
+        #Tokens charged to this session (checked against the session budget)
+        self.prompt_tokens= 0
+        self.completion_tokens= 0
+
+    @property
+    def tokens_used(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add_usage(self, prompt_tokens: int, completion_tokens: int):
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+
+    """
+    Stores one exchange as displayed to the user (with turn indicators and
+    warnings). Unlike history, it survives the session-limit reset.
+    """
+    def record_transcript(self, user_text: str, shown_text: str):
+        for turn in (Turn("user", user_text), Turn("assistant", shown_text)):
+            if len(self.transcript) == self.transcript.capacity:
+                self.transcript_dropped += 1
+            self.transcript.append(turn)
+
+    """
+    The last `size` transcript messages (oldest first), and whether older
+    messages exist beyond them (including ones already evicted from the ring).
+    """
+    def transcript_window(self, size: int):
+        start = max(0, len(self.transcript) - size)
+        return self.transcript[start:], start > 0 or self.transcript_dropped > 0
+
+
+    """
+    Plain-JSON representation of the session, used by the shared session
+    store so any worker process can resume the conversation.
+    With recall=False the recall documents are left out (SQLiteSessionStore
+    stores them in their own table); only "recall_seq" is kept.
+    """
+    def to_dict(self, recall: bool = True) -> dict:
+        data = {
+            "session_id": self.session_id,
+            "turn_count": self.turn_count,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "context_window": self.context_window,
+            "history": [[turn.role, turn.content] for turn in self.history],
+        }
+        #Only the web UI records a transcript; API sessions don't store one
+        if len(self.transcript):
+            data["transcript"] = [[turn.role, turn.content] for turn in self.transcript]
+        if self.transcript_dropped:
+            data["transcript_dropped"] = self.transcript_dropped
+        if recall and len(self.recall):
+            data["recall"] = self.recall.to_list()
+        if self.recall.next_seq:
+            data["recall_seq"] = self.recall.next_seq
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ConversationManager":
+        cm = cls()
+        if data.get("context_window", cls.context_window) != cls.context_window:
+            cm.context_window = data["context_window"]
+            cm.history.resize(cm.context_window * 2)
+        for role, content in data.get("history", []):
+            cm.history.append(Turn(role, content))
+        for role, content in data.get("transcript", []):
+            cm.transcript.append(Turn(role, content))
+        cm.transcript_dropped = data.get("transcript_dropped", 0)
+        if data.get("recall"):
+            cm.recall = RecallIndex.from_list(data["recall"])
+        cm.turn_count = data.get("turn_count", 0)
+        cm.session_id = data.get("session_id", cm.session_id)
+        cm.prompt_tokens = data.get("prompt_tokens", 0)
+        cm.completion_tokens = data.get("completion_tokens", 0)
+        return cm
     
 
     """"
@@ -57,59 +142,73 @@ class ConversationManager:
 
 
     """
-    Suggests a slash-command when the user writes something that resemebles a 
-    note, reminder, or search request.
-    NOT NLU BASED, JUST HEURISTICS
+    Suggests a slash-command when the user writes something that resembles a 
+    note, reminder, search, view-note or agenda request.
+    Uses the local hashed n-gram classifier (core/intent.py), loaded on first
+    use so importing this module stays light. Only suggests when the
+    classifier is confident enough (suggestion_threshold).
     """
-    
+    SUGGESTIONS = {
+        "NOTE": "Parece que quieres crear una nota.  Usa: /nota <texto>",
+        "REMINDER": "Parece que quieres crear un recordatorio. Usa: /recordatorio <texto>",
+        "SEARCH": "Parece que quieres hacer una búsqueda. Usa: /busqueda <texto>",
+        "VIEWNOTE": "Parece que quieres ver una nota. Usa: /vernota <texto>",
+        "AGENDA": "Parece que quieres ver tu agenda. Usa: /agenda",
+    }
+    COMMANDS = {
+        "NOTE": "/nota", "REMINDER": "/recordatorio", "SEARCH": "/busqueda",
+        "VIEWNOTE": "/vernota", "AGENDA": "/agenda",
+    }
+    suggestion_threshold= 0.5
+
     def intent_suggestion(self, text):
-        t= text.lower()
-        suggestions= []
-
-        #Keywords for notes 
-        if any(kw in t for kw in
-                ["nota", "apuntar", "escribe", "escribir", "apuntar", "apúntame", "anotar"]):
-            suggestions.append ("Parece que quieres crear una nota.  Usa: /nota <texto>")
-        #Keywords for reminders
-        if any(kw in t for kw in  
-                ["recordatorio", "recordar", "recuérdame","avísame", "no olvidar"]):
-            suggestions.append("Parece que quieres crear un recordatorio. Usa: /recordatorio <texto>")
-    
-        #Keywords for search
-        if any(kw in t for kw in  
-                ["buscar", "investigar", "averiguar", "información sobre", "dime sobre"]):
-            suggestions.append("Parece que quieres hacer una búsqueda. Usa: /busqueda <texto>")
-        
-        # Keywords for view note
-        if ("nota" in t) and any(kw in t for kw in ["ver", "mostrar", "muéstrame"]):
-            suggestions.append("Parece que quieres ver una nota. Usa: /vernota <texto>")
+        from core.intent import default_classifier
 
-        # Keywords for agenda
-        if any(kw in t for kw in ["ver agenda", "mostrar agenda", "agenda", "qué tengo pendiente"]):
-            suggestions.append("Parece que quieres ver tu agenda. Usa: /agenda")
+        intent, confidence = default_classifier().predict(text)
 
         # If no suggestions, return None
-        if not suggestions:
+        if intent not in self.SUGGESTIONS or confidence < self.suggestion_threshold:
             return None
         
-        return "Puedo ayudarte con estas acciones:\n" + "\n".join(suggestions)
+        return "Puedo ayudarte con estas acciones:\n" + self.SUGGESTIONS[intent]
+
+
+    """
+    The command text the user is expected to send after a suggestion,
+    e.g. "apúntame esto" -> "/nota apúntame esto". None if nothing applies.
+    """
+    def suggested_command(self, text):
+        from core.intent import default_classifier
+
+        intent, confidence = default_classifier().predict(text)
+        if intent not in self.COMMANDS or confidence < self.suggestion_threshold:
+            return None
+        if intent == "AGENDA":
+            return self.COMMANDS[intent]
+        return f"{self.COMMANDS[intent]} {text.strip()}"
     
     
     def update_state(self, user_text: str, assistant_text:str):
 
         self.turn_count += 1
 
-        self.history.append({"role":"user", "content": user_text})             #store user turn
-        self.history.append({"role":"assistant", "content": assistant_text})   #store assistant turn
+        #Maintain only the last N turns for context (each turn has user and assistant)
+        if self.history.capacity != self.context_window * 2:
+            self.history.resize(self.context_window * 2)
+
+        #The ring buffer drops the oldest turns in place once full
+        self.history.append(Turn("user", user_text))             #store user turn
+        self.history.append(Turn("assistant", assistant_text))   #store assistant turn
 
-        #Maintain only the lastt N turns for context
-        if len(self.history)> self.context_window * 2:
-            self.history= self.history[- self.context_window * 2 :]  #each turn has user and assistant
+        #Every exchange stays searchable after it leaves the window
+        kind= "note" if user_text.strip().lower().startswith("/nota") else "turn"
+        self.recall.add(user_text, assistant_text, kind)
     
 
     """"
     Main entry point for processing user input through the conversation pipeline.
     Returns a tuple: (intentm, prompt_ket, history2llm)
+    history2llm is an immutable snapshot (tuple of Turn) of the ring buffer.
     
     """
     def pipeline(self, user_input: str): 
@@ -117,7 +216,7 @@ class ConversationManager:
         sanitized_input= sanitize_input(user_input)
 
         if isinstance(sanitized_input, str) and sanitized_input.startswith("Lo siento"):
-            return "BLOCKED", "SP_DEFAULT", self.history, sanitized_input
+            return "BLOCKED", "SP_DEFAULT", self.history.snapshot(), sanitized_input
         
         user_input= sanitized_input
         
@@ -127,7 +226,7 @@ class ConversationManager:
             end_session= ("Has alcanzado el número máximo de turnos. He reiniciado la conversación. Puedes continuar cuando quieras.")
 
             #Reset internal state
-            self.history=[]
+            self.history.clear()
             self.turn_count= 0
 
 
@@ -144,7 +243,7 @@ class ConversationManager:
             #Suggest the slash-command when applicable 
             suggestion= self.intent_suggestion(user_input)
             if suggestion: 
-                return "SUGGESTION", "SP_DEFAULT",  self.history.copy(),suggestion
+                return "SUGGESTION", "SP_DEFAULT",  self.history.snapshot(),suggestion
         
             #If there is no sggestion -> normal parse
             parsed= self._parse(user_input)
@@ -164,81 +263,14 @@ class ConversationManager:
                 prompt_key = "SP_REMINDER"
                 text = payload.strip()
 
-                # Detect a date expression like: "3 de diciembre", "10 de Septiembre", "05/12/2025"
-                date_patterns = date_patterns = r"\d{1,2}\s*de\s*[a-záéíóú]+\s*(de\s*\d{4})?|\d{1,2}/\d{1,2}/\d{2,4}"
-                found = re.search(date_patterns, text.lower())
-
-                if not found:
-                    return (
-                        "BLOCKED",
-                        "SP_DEFAULT",
-                        self.history,
-                        "Necesito la fecha para crear este recordatorio. ¿Qué fecha deseas usar?",
-                    )
-
-                raw_date = found.group().strip()
-                parsed_date = None
-
-                #Dictionary for mapping 
-                meses = {
-                    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4,
-                    "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
-                    "septiembre": 9, "setiembre": 9,
-                    "octubre": 10, "noviembre": 11, "diciembre": 12
-                }
-
-        
-                # DD/MM/YYYY  format
-                if "/" in raw_date:
-                    try:
-                        parsed_date = datetime.strptime(raw_date.replace(" ", ""), "%d/%m/%Y")
-                    except:
-                        parsed_date = None
-
-                else:
-                    try:
-                        tokens = raw_date.split()
-                        day = int(tokens[0])
-
-                        month_str_norm = tokens[2].lower()
-
-                        month = meses.get(month_str_norm)   # direct match
-
-                        # fuzzy correction if needed
-                        if month is None:
-                            posibles = difflib.get_close_matches(
-                                month_str_norm, meses.keys(), n=1, cutoff=0.7
-                            )
-                            if posibles:
-                                month = meses[posibles[0]]
-
-                        year = datetime.now().year   # detect year
-                        if len(tokens) >= 5 and tokens[-1].isdigit() and len(tokens[-1]) == 4:
-                            year = int(tokens[-1])
-
-                        if month:
-                             parsed_date = datetime(year=year, month=month, day=day)
-
-                    except:
-                        parsed_date = None
-
-                #Still invalid
-                if parsed_date is None:
-                    return (
-                        "BLOCKED",
-                        "SP_DEFAULT",
-                        self.history,
-                        "No pude interpretar la fecha. Usa formatos como '5 de diciembre' o '05/12/2025'.",
-                    )
-
-                #Rejects past dates
-                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                if parsed_date < today:
+                #Date parsing is shared with the bulk importer (core/dates.py)
+                _, error = parse_reminder_date(text)
+                if error is not None:
                     return (
                         "BLOCKED",
                         "SP_DEFAULT",
-                        self.history,
-                        "La fecha proporcionada ya pasó. No puedo crear recordatorios con fechas anteriores a hoy.",
+                        self.history.snapshot(),
+                        REMINDER_ERRORS[error],
                     )
                 
                 payload = text
@@ -258,7 +290,7 @@ class ConversationManager:
 
 
 
-        return intent, prompt_key, self.history, payload
+        return intent, prompt_key, self.history.snapshot(), payload
 
 
     
\ No newline at end of file
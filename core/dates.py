@@ -0,0 +1,88 @@
+# core/dates.py
+"""
+Reminder date parsing, shared by the conversation pipeline (/recordatorio)
+and the bulk importer (services/importer.py).
+
+Accepts "3 de diciembre", "10 de septiembre de 2026" (misspelled months are
+fuzzy-matched) and "05/12/2026". Past dates are rejected.
+"""
+
+#Dependencies
+import difflib
+import re
+from datetime import datetime
+
+# Detect a date expression like: "3 de diciembre", "10 de Septiembre", "05/12/2025"
+DATE_PATTERN = re.compile(r"\d{1,2}\s*de\s*[a-záéíóú]+\s*(de\s*\d{4})?|\d{1,2}/\d{1,2}/\d{2,4}")
+
+MONTHS = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4,
+    "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
+    "septiembre": 9, "setiembre": 9,
+    "octubre": 10, "noviembre": 11, "diciembre": 12
+}
+
+#User-facing message per parse error
+REMINDER_ERRORS = {
+    "missing": "Necesito la fecha para crear este recordatorio. ¿Qué fecha deseas usar?",
+    "invalid": "No pude interpretar la fecha. Usa formatos como '5 de diciembre' o '05/12/2025'.",
+    "past": "La fecha proporcionada ya pasó. No puedo crear recordatorios con fechas anteriores a hoy.",
+}
+
+
+def _month(name: str):
+    month = MONTHS.get(name)   # direct match
+    if month is None:
+        # fuzzy correction if needed
+        posibles = difflib.get_close_matches(name, MONTHS.keys(), n=1, cutoff=0.7)
+        if posibles:
+            month = MONTHS[posibles[0]]
+    return month
+
+
+"""
+Finds and parses the reminder date in text.
+Returns (datetime, None) or (None, error) where error is a REMINDER_ERRORS
+key: "missing", "invalid" or "past". `today` defaults to the current date
+(the bulk importer passes it once per batch).
+"""
+def parse_reminder_date(text: str, today: datetime = None):
+    found = DATE_PATTERN.search(text.lower())
+    if not found:
+        return None, "missing"
+
+    raw_date = found.group().strip()
+    now = today or datetime.now()
+    parsed_date = None
+
+    # DD/MM/YYYY  format
+    if "/" in raw_date:
+        try:
+            parsed_date = datetime.strptime(raw_date.replace(" ", ""), "%d/%m/%Y")
+        except ValueError:
+            parsed_date = None
+
+    else:
+        try:
+            tokens = raw_date.split()
+            day = int(tokens[0])
+            month = _month(tokens[2].lower())
+
+            year = now.year   # detect year
+            if len(tokens) >= 5 and tokens[-1].isdigit() and len(tokens[-1]) == 4:
+                year = int(tokens[-1])
+
+            if month:
+                parsed_date = datetime(year=year, month=month, day=day)
+
+        except (ValueError, IndexError):
+            parsed_date = None
+
+    #Still invalid
+    if parsed_date is None:
+        return None, "invalid"
+
+    #Rejects past dates
+    if parsed_date < now.replace(hour=0, minute=0, second=0, microsecond=0):
+        return None, "past"
+    return parsed_date, None
@@ -0,0 +1,131 @@
+# core/history.py
+"""
+Storage for the short-term conversation history.
+
+Turns are small immutable slotted objects kept in a fixed-capacity ring
+buffer, so appending never re-slices the list and a session holds two
+pointers per message instead of a dict. They become the {"role", "content"}
+dicts the Groq SDK takes only in build_messages (core/prompting.py).
+"""
+
+
+class Turn:
+    """
+    A single chat message (system, user or assistant), frozen once built.
+    turn["role"] / turn["content"] are read-only aliases of the attributes,
+    for code written against the old message dicts.
+    """
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str):
+        #Slot descriptors set the fields directly, past the __setattr__ guard
+        _set_role(self, role)
+        _set_content(self, content)
+
+    def __setattr__(self, name, value):
+        raise TypeError("Turn objects are immutable")
+
+    __delattr__ = __setattr__
+
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def as_message(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
+    def __eq__(self, other):
+        if isinstance(other, Turn):
+            return self.role == other.role and self.content == other.content
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.role, self.content))
+
+    def __reduce__(self):
+        return (Turn, (self.role, self.content))
+
+    def __repr__(self):
+        return f"Turn(role={self.role!r}, content={self.content!r})"
+
+
+_set_role = Turn.role.__set__
+_set_content = Turn.content.__set__
+
+
+class TurnBuffer:
+    """
+    Fixed-capacity ring buffer of Turn objects.
+    Once full, each append overwrites the oldest turn in place.
+    """
+    __slots__ = ("_slots", "_start", "_size")
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self._slots = [None] * capacity
+        self._start = 0
+        self._size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._slots)
+
+    def append(self, turn: Turn):
+        capacity = len(self._slots)
+        if self._size < capacity:
+            self._slots[(self._start + self._size) % capacity] = turn
+            self._size += 1
+        else:
+            self._slots[self._start] = turn
+            self._start = (self._start + 1) % capacity
+
+    def clear(self):
+        self._slots = [None] * len(self._slots)
+        self._start = 0
+        self._size = 0
+
+    def resize(self, capacity: int):
+        """Changes the capacity, keeping the most recent turns."""
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        kept = self.snapshot()[-capacity:]
+        self._slots = list(kept) + [None] * (capacity - len(kept))
+        self._start = 0
+        self._size = len(kept)
+
+    def snapshot(self) -> tuple:
+        """Returns the stored turns (oldest first) as an immutable tuple."""
+        end = self._start + self._size
+        capacity = len(self._slots)
+        if end <= capacity:
+            return tuple(self._slots[self._start:end])
+        return tuple(self._slots[self._start:]) + tuple(self._slots[:end - capacity])
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.snapshot()[index]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("turn index out of range")
+        return self._slots[(self._start + index) % len(self._slots)]
+
+    def __eq__(self, other):
+        if isinstance(other, TurnBuffer):
+            return self.snapshot() == other.snapshot()
+        if isinstance(other, (list, tuple)):
+            return list(self.snapshot()) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TurnBuffer(capacity={self.capacity}, turns={list(self.snapshot())!r})"
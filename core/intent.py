@@ -0,0 +1,213 @@
+# core/intent.py
+"""
+Small local intent classifier used to suggest slash-commands.
+
+Text is turned into hashed features (character 3/4-grams plus word uni- and
+bigrams) and scored with NumPy against one weight vector per intent
+(multinomial logistic regression). Training runs in-process from a labeled
+JSONL file ({"text": ..., "intent": ...} per line); the weights trained from
+core/data/intents.jsonl ship as core/data/intent_model.npz, so serving only
+loads them. Classification of one input or a batch is a vectorized gather-and-sum
+over the weight matrix.
+"""
+
+#Dependencies
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+INTENTS = ("NONE", "NOTE", "REMINDER", "SEARCH", "VIEWNOTE", "AGENDA")
+
+DEFAULT_TRAINING_DATA = os.path.join(os.path.dirname(__file__), "data", "intents.jsonl")
+DEFAULT_MODEL = os.path.join(os.path.dirname(__file__), "data", "intent_model.npz")
+
+_NON_WORD = re.compile(r"[^a-z0-9ñ/ ]+")
+
+
+_ACCENTS = str.maketrans("áéíóúüàèìòùâêîôû", "aeiouuaeiouaeiou")
+
+
+"""Lowercase, strip accents (except ñ) and punctuation."""
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).lower().translate(_ACCENTS)
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _hash(gram: str, dim: int) -> int:
+    return zlib.crc32(gram.encode()) % dim
+
+
+#Word-level ids (unigram + char n-grams) repeat across inputs, so they are cached
+@lru_cache(maxsize=50000)
+def _word_ids(word: str, dim: int) -> tuple:
+    padded = f" {word} "
+    grams = [f"w:{word}"]
+    for n in (3, 4):
+        grams += [padded[i:i + n] for i in range(len(padded) - n + 1)]
+    return tuple(_hash(g, dim) for g in grams)
+
+
+def _feature_ids(text: str, dim: int) -> list:
+    words = normalize(text).split()
+    ids = []
+    for w in words:
+        ids.extend(_word_ids(w, dim))
+    ids.extend(_hash(f"b:{a} {b}", dim) for a, b in zip(words, words[1:]))
+    return ids
+
+
+class IntentClassifier:
+    def __init__(self, dim: int = 4096, intents=INTENTS):
+        self.dim = dim
+        self.intents = tuple(intents)
+        self.weights = np.zeros((dim, len(self.intents)), dtype=np.float32)
+        self.bias = np.zeros(len(self.intents), dtype=np.float32)
+
+
+    """
+    Hashed, L2-normalized feature matrix of shape (len(texts), dim).
+    """
+    def featurize(self, texts) -> np.ndarray:
+        X = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            ids = _feature_ids(text, self.dim)
+            if ids:
+                np.add.at(X[row], ids, 1.0)
+        norms = np.linalg.norm(X, axis=1, keepdims=True)
+        np.divide(X, norms, out=X, where=norms > 0)
+        return X
+
+    """
+    Class probabilities, shape (len(texts), len(intents)).
+    Inference never builds the dense matrix: the weight rows of each text's
+    hashed ids are gathered and summed per text (same result as
+    featurize(texts) @ weights).
+    """
+    def predict_proba(self, texts) -> np.ndarray:
+        per_text = [_feature_ids(text, self.dim) for text in texts]
+        lengths = np.fromiter((len(ids) for ids in per_text), dtype=np.int64, count=len(texts))
+        flat = np.fromiter((i for ids in per_text for i in ids), dtype=np.int64,
+                           count=int(lengths.sum()))
+
+        scores = np.tile(self.bias, (len(texts), 1))
+        if flat.size:
+            rows = np.repeat(np.arange(len(texts)), lengths)
+
+            #L2 norm of each count vector: sum of squared (row, id) multiplicities
+            keys, mult = np.unique(rows * self.dim + flat, return_counts=True)
+            norms = np.sqrt(np.bincount(keys // self.dim, weights=mult.astype(np.float64) ** 2,
+                                        minlength=len(texts)))
+
+            nonempty = lengths > 0
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[nonempty]
+            sums = np.add.reduceat(self.weights[flat], starts, axis=0)
+            scores[nonempty] += sums / norms[nonempty, None].astype(np.float32)
+
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+    def predict_batch(self, texts) -> list:
+        """Returns [(intent, probability), ...] for each text."""
+        proba = self.predict_proba(texts)
+        best = proba.argmax(axis=1)
+        return [(self.intents[i], float(proba[row, i])) for row, i in enumerate(best)]
+
+    """
+    Single-input fast path (avoids the batch bookkeeping).
+    Returns (intent, probability).
+    """
+    def predict(self, text: str):
+        ids = _feature_ids(text, self.dim)
+        scores = self.bias.copy()
+        if ids:
+            norm = math.sqrt(sum(c * c for c in Counter(ids).values()))
+            scores += self.weights[ids].sum(axis=0) / norm
+        scores = np.exp(scores - scores.max())
+        best = int(scores.argmax())
+        return self.intents[best], float(scores[best] / scores.sum())
+
+
+    """
+    Full-batch gradient descent on the softmax cross-entropy with L2.
+    """
+    def fit(self, texts, labels, epochs: int = 300, lr: float = 2.0, l2: float = 1e-4):
+        X = self.featurize(texts)
+        index = {intent: i for i, intent in enumerate(self.intents)}
+        Y = np.zeros((len(labels), len(self.intents)), dtype=np.float32)
+        Y[np.arange(len(labels)), [index[label] for label in labels]] = 1.0
+
+        n = len(texts)
+        for _ in range(epochs):
+            scores = X @ self.weights + self.bias
+            scores -= scores.max(axis=1, keepdims=True)
+            P = np.exp(scores)
+            P /= P.sum(axis=1, keepdims=True)
+            grad = P - Y
+            self.weights -= lr * (X.T @ grad / n + l2 * self.weights)
+            self.bias -= lr * grad.mean(axis=0)
+        return self
+
+    @classmethod
+    def from_jsonl(cls, path: str, **kwargs) -> "IntentClassifier":
+        texts, labels = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    texts.append(row["text"])
+                    labels.append(row["intent"])
+        return cls(**kwargs).fit(texts, labels)
+
+    def save(self, path: str):
+        np.savez(path, weights=self.weights, bias=self.bias, intents=np.array(self.intents))
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        data = np.load(path)
+        clf = cls(dim=data["weights"].shape[0], intents=[str(i) for i in data["intents"]])
+        clf.weights = data["weights"]
+        clf.bias = data["bias"]
+        return clf
+
+
+_default = None
+_default_lock = threading.Lock()
+
+"""
+Process-wide classifier, loaded once: INTENT_MODEL if set, else the shipped
+core/data/intent_model.npz (trained from core/data/intents.jsonl only if the
+file is missing). Concurrent first calls wait for a single load.
+"""
+def default_classifier() -> IntentClassifier:
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                model_path = os.getenv("INTENT_MODEL") or DEFAULT_MODEL
+                if os.path.exists(model_path):
+                    _default = IntentClassifier.load(model_path)
+                else:
+                    _default = IntentClassifier.from_jsonl(DEFAULT_TRAINING_DATA)
+    return _default
+
+"""
+Train from a labeled JSONL and save the weights (.npz) for INTENT_MODEL.
+Regenerate the shipped model after editing core/data/intents.jsonl:
+    python -m core.intent core/data/intents.jsonl core/data/intent_model.npz
+"""
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m core.intent <train.jsonl> <out.npz>")
+    IntentClassifier.from_jsonl(sys.argv[1]).save(sys.argv[2])
@@ -0,0 +1,164 @@
+# core/output.py
+"""
+Output-shape limits for the model's answers.
+
+Some system prompts ask for a short answer (SP_SEARCH: 3–5 lines,
+SP_REMINDER: a single confirmation) but the model may keep going until
+max_tokens. An OutputLimit states the expected shape: max non-blank lines,
+max sentences and stop patterns (regexes matched at the start of every line
+after the first, e.g. a closing "¿Quieres saber más?"). An OutputChecker
+applies it to the answer while it streams, so LLMClient can close the
+stream as soon as the limit is met instead of paying for the rest of the
+generation.
+"""
+
+#Dependencies
+import re
+
+#End of a sentence: terminators followed by whitespace and an uppercase
+#letter (the next sentence has to start before the previous one counts)
+_SENTENCE_END = re.compile(r"[.!?…]+(?=\s+[¿¡\"«(]*[A-ZÁÉÍÓÚÑ])")
+
+#What may follow a sentence end before the next sentence's first letter;
+#while only these follow the last terminator, that text is held back
+_SENTENCE_GAP = frozenset(" \t\n\r¿¡\"«(")
+
+#Word before a "." that doesn't end a sentence: numbers ("1."), initials and
+#short abbreviations ("a. m.", "Dr."), and longer common abbreviations
+_NOT_SENTENCE = re.compile(r"(?:\b\d+|\b\w{1,2}|\b(?:etc|aprox|ene|feb|mar|abr|may|jun|jul|ago|"
+                           r"sep|sept|oct|nov|dic|tel|pág|núm|Sra|Srta|Lic|Ing|Dra))$",
+                           re.IGNORECASE)
+
+#With stop patterns, a new line is held back until it is complete or this
+#long, so a match split across deltas is never half sent
+STOP_LOOKAHEAD = 64
+
+
+class OutputLimit:
+    """Shape an answer must fit. Unset fields are not checked."""
+    __slots__ = ("max_lines", "max_sentences", "stop")
+
+    def __init__(self, max_lines: int = None, max_sentences: int = None, stop=()):
+        self.max_lines = max_lines
+        self.max_sentences = max_sentences
+        self.stop = re.compile("|".join(f"(?:{p})" for p in stop)) if stop else None
+
+    def checker(self) -> "OutputChecker":
+        return OutputChecker(self)
+
+
+class OutputChecker:
+    """
+    Incremental check of one answer. feed(delta) returns the text that can
+    be sent so far, and flush() what is still held back once the answer
+    ends. When the limit is met, done is True, reason says which rule cut
+    the answer ("max_lines", "max_sentences" or "stop") and the rest of the
+    answer is dropped (counted in dropped_chars).
+    """
+    def __init__(self, limit: OutputLimit):
+        self.limit = limit
+        self.text = ""
+        self.done = False
+        self.reason = None
+        self.dropped_chars = 0
+        self._lines = 0
+        self._line_start = 0
+        self._sentences = 0
+        self._sentence_pos = 0
+        self._stop_pos = 0
+        self._sent = 0
+
+    def feed(self, delta: str) -> str:
+        if self.done:
+            self.dropped_chars += len(delta)
+            return ""
+
+        start = len(self.text)
+        self.text += delta
+        stop_cut, held = self._stop_cut()
+        sentence_cut, sentence_held = self._sentence_cut()
+        cuts = [cut for cut in (self._line_cut(start), sentence_cut, stop_cut)
+                if cut is not None]
+        if not cuts:
+            return self._send(min(held, sentence_held))
+
+        #Text past the cut is never sent, whichever way the deltas were split
+        cut, self.reason = min(cuts)
+        self.done = True
+        self.dropped_chars += len(self.text) - cut
+        self.text = self.text[:cut]
+        return self._send(cut)
+
+    def flush(self) -> str:
+        """Held-back text once the answer ended without reaching the limit."""
+        return "" if self.done else self._send(len(self.text))
+
+    def _send(self, end: int) -> str:
+        text = self.text[self._sent:end]
+        self._sent = max(self._sent, end)
+        return text
+
+    def _line_cut(self, start: int):
+        if self.limit.max_lines is None:
+            return None
+        newline = self.text.find("\n", start)
+        while newline != -1:
+            if self.text[self._line_start:newline].strip():
+                self._lines += 1
+                if self._lines >= self.limit.max_lines:
+                    return newline, "max_lines"
+            self._line_start = newline + 1
+            newline = self.text.find("\n", newline + 1)
+        return None
+
+    """
+    Counts the sentences ended so far. Returns (cut, held): the cut once
+    max_sentences is reached, else the position text can be sent up to (the
+    gap after a trailing terminator is held until the next letter decides
+    whether it ended a sentence).
+    """
+    def _sentence_cut(self):
+        if self.limit.max_sentences is None:
+            return None, len(self.text)
+        for match in _SENTENCE_END.finditer(self.text, self._sentence_pos):
+            self._sentence_pos = match.end()
+            if (match.group() == "."
+                    and _NOT_SENTENCE.search(self.text, max(0, match.start() - 8), match.start())):
+                continue
+            self._sentences += 1
+            if self._sentences >= self.limit.max_sentences:
+                return (match.end(), "max_sentences"), match.end()
+
+        end = len(self.text)
+        while end > self._sentence_pos and self.text[end - 1] in _SENTENCE_GAP:
+            end -= 1
+        if end > self._sentence_pos and self.text[end - 1] in ".!?…":
+            return None, end
+        return None, len(self.text)
+
+    """
+    Checks the stop patterns against each new line. Returns (cut, held):
+    the cut when a line matches, else the position text can be sent up to
+    (a line that could still match once more text arrives is held back).
+    """
+    def _stop_cut(self):
+        if self.limit.stop is None:
+            return None, len(self.text)
+        pos, blank_from = self._stop_pos, None
+        while True:
+            newline = self.text.find("\n", pos)
+            if newline == -1:
+                return None, len(self.text)
+            #Blank lines before a match are cut (or held) with it
+            held = newline if blank_from is None else blank_from
+            line_start = newline + 1
+            line_end = self.text.find("\n", line_start)
+            if line_end != -1 and not self.text[line_start:line_end].strip():
+                blank_from, pos = held, line_start
+                continue
+            if self.limit.stop.match(self.text, line_start):
+                return (held, "stop"), held
+            if line_end == -1 and len(self.text) - line_start < STOP_LOOKAHEAD:
+                return None, held
+            self._stop_pos = pos = line_start
+            blank_from = None
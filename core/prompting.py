@@ -6,6 +6,9 @@ Defines systems prompts, input sanitization, and message building for the AI Cop
 #Dependecies
 import unicodedata
 import re 
+from types import MappingProxyType
+from core.history import Turn
+from core.output import OutputLimit
 
 
 SYSTEM_PROMPTS = {
@@ -74,36 +77,61 @@ Indica amablemente que se ha reiniciado la conversación.
 
 
 
+#Follow-up offers ("¿Quieres que...?") on a new line extend the conversation
+_FOLLOW_UP = r"\s*¿(?:Necesitas|Quieres|Deseas|Te gustaría|Hay algo)"
+
+"""
+Output shape per prompt_key, enforced while the answer streams
+(core/output.py). Mirrors the length each system prompt asks for; prompts
+without an entry are only bounded by max_tokens.
+"""
+OUTPUT_LIMITS = {
+    "SP_SEARCH": OutputLimit(max_lines=5, stop=(_FOLLOW_UP,)),
+    "SP_REMINDER": OutputLimit(max_lines=3, max_sentences=1, stop=(_FOLLOW_UP,)),
+}
+
+
+EMPTY_INPUT = "Entrada vacía. Por favor proporciona más detalles."
+BLOCKED_INPUT = "Lo siento, no puedo ayudar con esa solicitud."
+
+#Compiled once at import (the bulk importer sanitizes every entry)
+_CONTROL_CHARS = re.compile(r'[\x00-\x1F\x7F]')
+_EMOJI = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F700-\U0001F77F"  # alchemical symbols
+    "\U0001F780-\U0001F7FF"  # geometric shapes extended
+    "\U0001F800-\U0001F8FF"  # supplemental arrows
+    "\U0001F900-\U0001F9FF"  # supplemental symbols/pictographs
+    "\U0001FA00-\U0001FA6F"  # chess symbols, etc
+    "\U0001FA70-\U0001FAFF"
+    "\U00002702-\U000027B0"  # dingbats
+    "\U000024C2-\U0001F251"
+    "]+",
+    flags=re.UNICODE,
+)
+_DANGEROUS = re.compile("|".join([
+    "hackear", "explosivo", "droga", "armas", "terrorismo", "suicid",
+    "violencia", "ddos", "malware", "pornografía", "matarme", "amenaza"
+]))
+
+
 """
 Sanitize and validate user input to ensure safety and appropriateness."""
 def sanitize_input(text: str) -> str:
     if not text: 
-        return "Entrada vacía. Por favor proporciona más detalles."
+        return EMPTY_INPUT
     
     #1. Unicode normalization 
     text= unicodedata.normalize("NFKC", text)
     
     #2. Remove control characters
-    text = re.sub(r'[\x00-\x1F\x7F]', "", text)
+    text = _CONTROL_CHARS.sub("", text)
 
     #3.  Simple emoji or corrupt emoji removal
-    emoji= re.compile(
-        "["
-        "\U0001F600-\U0001F64F"  # emoticons
-        "\U0001F300-\U0001F5FF"  # symbols & pictographs
-        "\U0001F680-\U0001F6FF"  # transport & map symbols
-        "\U0001F700-\U0001F77F"  # alchemical symbols
-        "\U0001F780-\U0001F7FF"  # geometric shapes extended
-        "\U0001F800-\U0001F8FF"  # supplemental arrows
-        "\U0001F900-\U0001F9FF"  # supplemental symbols/pictographs
-        "\U0001FA00-\U0001FA6F"  # chess symbols, etc
-        "\U0001FA70-\U0001FAFF"
-        "\U00002702-\U000027B0"  # dingbats
-        "\U000024C2-\U0001F251"
-        "]+",
-        flags=re.UNICODE,
-    )
-    text= emoji.sub(r"", text)
+    text= _EMOJI.sub(r"", text)
 
     #4. Collapse whitespace
     text= " ".join(text.split())
@@ -113,31 +141,78 @@ def sanitize_input(text: str) -> str:
         text= text[:2000]
     
     #6. Dangerous content check (simple keyword filter)
-    dangerous_keywords= [
-        "hackear", "explosivo", "droga", "armas", "terrorismo", "suicid",
-        "violencia", "ddos", "malware", "pornografía", "matarme", "amenaza"
-        ]
-    lowered= text.lower()
-    for keyword in dangerous_keywords:
-        if keyword in lowered:
-            return "Lo siento, no puedo ayudar con esa solicitud."  
+    if _DANGEROUS.search(text.lower()):
+        return BLOCKED_INPUT
     return text.strip()
 
 
+"""
+System message per prompt_key, built once at import as a 1-tuple holding a
+frozen Turn; neither the mapping nor the prompts can be modified by a caller.
+"""
+SYSTEM_PREFIXES = MappingProxyType({
+    key: (Turn("system", prompt),)
+    for key, prompt in SYSTEM_PROMPTS.items()
+})
+
+
+RECALL_HEADER = ("Fragmentos de turnos anteriores de esta conversación "
+                 "(úsalos solo si son relevantes para el mensaje actual):")
+
+#Max characters per recalled message, keeps the recall block small
+RECALL_SNIPPET_CHARS = 240
+
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) > RECALL_SNIPPET_CHARS:
+        return text[:RECALL_SNIPPET_CHARS] + "..."
+    return text
+
+
+"""
+System message with the recalled exchanges, or None if nothing matched.
+"""
+def format_recall(hits):
+    if not hits:
+        return None
+    lines = [RECALL_HEADER]
+    for _, kind, user, assistant in hits:
+        label = "Nota" if kind == "note" else "Usuario"
+        lines.append(f"- {label}: {_snippet(user)}\n  Asistente: {_snippet(assistant)}")
+    return {"role": "system", "content": "\n".join(lines)}
+
+
 """
 Build the final message list for the LLM model: 
 System message based on the detected intent
+Recalled past exchanges (optional, see core/recall.py)
 Recent history generated by ConversationManager
  New user message
+History entries may be Turn objects or plain {"role", "content"} dicts;
+every message in the returned list is a new dict, so the caller may change
+it without touching the session's history.
+With a RecallIndex, the top_k past exchanges most relevant to user_input
+that are no longer in `history` are added as one extra system message.
 """
-def build_messages(prompt_key: str, history:list, user_input:str ):
-    prompt = SYSTEM_PROMPTS.get(prompt_key, SYSTEM_PROMPTS["SP_DEFAULT"])
-    
-    messages= [{"role": "system", "content": prompt}]
+def build_messages(prompt_key: str, history, user_input:str, recall=None, top_k: int = 3):
+    prefix = SYSTEM_PREFIXES.get(prompt_key, SYSTEM_PREFIXES["SP_DEFAULT"])
+
+    messages= [turn.as_message() for turn in prefix]
+
+    #Long-term recall, skipping the exchanges still in the history window
+    if recall is not None and top_k > 0:
+        hits = recall.search(user_input, top_k, before=recall.next_seq - len(history) // 2)
+        recalled = format_recall(hits)
+        if recalled is not None:
+            messages.append(recalled)
 
     #Append conversation history (already truncated)
     for turn in history:
-        messages.append({"role": turn["role"], "content": turn["content"]})
+        if type(turn) is Turn:
+            messages.append({"role": turn.role, "content": turn.content})
+        else:
+            messages.append({"role": turn["role"], "content": turn["content"]})
 
     # Current turn
     messages.append({"role": "user", "content": user_input})
@@ -0,0 +1,164 @@
+# core/recall.py
+"""
+Long-term recall for a session.
+
+Every exchange (user message + answer) is added to a small BM25 inverted
+index, so turns that already left the context window can still be found.
+build_messages asks the index for the few past exchanges most relevant to
+the new input and sends only those snippets, instead of a longer history.
+
+Adding an exchange only touches the postings of its own terms, and a query
+only scores the most recent max_postings documents of each of its terms, so
+the cost per turn stays flat as the session grows. The index is capped at
+max_docs exchanges (oldest non-note exchanges are dropped first).
+"""
+
+#Dependencies
+import heapq
+import itertools
+import math
+import re
+import unicodedata
+from collections import Counter, deque
+
+_WORD = re.compile(r"[a-z0-9ñ]+")
+_ACCENTS = str.maketrans("áéíóúüàèìòùâêîôû", "aeiouuaeiouaeiou")
+
+STOPWORDS = frozenset("""
+a al algo como con de del el ella en es esa ese eso esta este esto fue ha hay la las le les
+lo los me mi mis muy no nos o para pero por que se si sin sobre su sus te tu un una uno y ya
+yo quiero puedes favor hola gracias
+""".split())
+
+
+"""Lowercase, accent-free words without stopwords (plural "s" trimmed)."""
+def tokenize(text: str) -> list:
+    text = unicodedata.normalize("NFC", text).lower().translate(_ACCENTS)
+    tokens = []
+    for word in _WORD.findall(text):
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("s"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class _Doc:
+    __slots__ = ("seq", "kind", "user", "assistant", "tf", "length")
+
+    def __init__(self, seq, kind, user, assistant, tf):
+        self.seq = seq
+        self.kind = kind
+        self.user = user
+        self.assistant = assistant
+        self.tf = tf
+        self.length = sum(tf.values())
+
+
+class RecallIndex:
+    """
+    Incremental BM25 index over a session's exchanges.
+    Documents are numbered by seq (0, 1, 2... in insertion order), so the
+    ones still inside the context window can be excluded from a search.
+    """
+    def __init__(self, max_docs: int = 500, max_postings: int = 64, k1: float = 1.2,
+                 b: float = 0.75):
+        self.max_docs = max_docs
+        self.max_postings = max_postings
+        self.k1 = k1
+        self.b = b
+        self._docs = {}              # seq -> _Doc
+        self._order = deque()        # seqs of evictable (non-note) docs, oldest first
+        self._postings = {}          # term -> {seq: term frequency}, oldest first
+        self._total_length = 0
+        self._next_seq = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    @property
+    def next_seq(self) -> int:
+        return self._next_seq
+
+
+    """
+    Indexes one exchange. kind is "note" for /nota exchanges, which are
+    kept when the index is full, otherwise "turn". seq is only given when
+    reloading stored documents (it must be >= next_seq).
+    """
+    def add(self, user_text: str, assistant_text: str, kind: str = "turn", seq: int = None) -> int:
+        seq = self._next_seq if seq is None else seq
+        self._next_seq = seq + 1
+        tf = Counter(tokenize(user_text) + tokenize(assistant_text))
+        doc = _Doc(seq, kind, user_text, assistant_text, tf)
+
+        self._docs[seq] = doc
+        self._total_length += doc.length
+        for term, count in tf.items():
+            self._postings.setdefault(term, {})[seq] = count
+        if kind != "note":
+            self._order.append(seq)
+
+        while len(self._docs) > self.max_docs and self._order:
+            self._remove(self._order.popleft())
+        return seq
+
+    def _remove(self, seq: int):
+        doc = self._docs.pop(seq)
+        self._total_length -= doc.length
+        for term in doc.tf:
+            postings = self._postings[term]
+            del postings[seq]
+            if not postings:
+                del self._postings[term]
+
+
+    """
+    Top-k exchanges for the query, best first, as (score, kind, user,
+    assistant). Documents with seq >= before are skipped (they are still in
+    the prompt's history).
+    """
+    def search(self, query: str, k: int = 3, before: int = None) -> list:
+        if k <= 0 or not self._docs:
+            return []
+        before = self._next_seq if before is None else before
+        n = len(self._docs)
+        avg_length = self._total_length / n or 1.0
+
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            #Newest documents first; the window's ones don't count towards the cap
+            recent = (item for item in reversed(postings.items()) if item[0] < before)
+            for seq, tf in itertools.islice(recent, self.max_postings):
+                norm = self.k1 * (1 - self.b + self.b * self._docs[seq].length / avg_length)
+                scores[seq] = scores.get(seq, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(round(score, 4), self._docs[seq].kind, self._docs[seq].user,
+                 self._docs[seq].assistant) for seq, score in best]
+
+
+    def advance(self, seq: int):
+        """Moves next_seq up to seq (stored documents may have been evicted)."""
+        self._next_seq = max(self._next_seq, seq)
+
+    def docs_since(self, seq: int) -> list:
+        """[(seq, kind, user, assistant), ...] still indexed with seq >= seq."""
+        return [(d.seq, d.kind, d.user, d.assistant)
+                for s, d in sorted(self._docs.items()) if s >= seq]
+
+    def to_list(self) -> list:
+        """[[kind, user, assistant], ...] oldest first (plain JSON)."""
+        return [[d.kind, d.user, d.assistant] for _, d in sorted(self._docs.items())]
+
+    @classmethod
+    def from_list(cls, items, **kwargs) -> "RecallIndex":
+        index = cls(**kwargs)
+        for kind, user, assistant in items:
+            index.add(user, assistant, kind)
+        return index
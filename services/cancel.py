@@ -0,0 +1,111 @@
+# services/cancel.py
+
+"""
+Cancellation of in-flight turns.
+
+A CancelToken travels with one request down to LLMClient.generate/stream,
+which check it between attempts, wait on it instead of sleeping during
+backoff, and stop reading a stream as soon as it is set.
+
+CancelRegistry ties tokens to a session: starting a new request on a
+session cancels the previous one ("superseded") and waits for it to leave
+before running, so turns of one session never overlap. A disconnect or a
+closed tab cancels the session's current request.
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self.reason = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Returns False if it was already cancelled."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+        return True
+
+    def wait(self, secs: float) -> bool:
+        """Sleeps up to secs; returns True (early) if cancelled meanwhile."""
+        return self._event.wait(secs)
+
+
+    """
+    Runs callback on cancellation (right away if already cancelled), e.g.
+    closing an open HTTP stream so a blocked read returns.
+    """
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+class _Slot:
+    __slots__ = ("lock", "token", "users")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.token = None
+        self.users = 0
+
+
+class CancelRegistry:
+    """Latest request per key (session id); older ones are superseded."""
+    def __init__(self):
+        self._slots = {}
+        self._lock = threading.Lock()
+        self.superseded = 0
+
+
+    """
+    Yields a token (a new one unless given) for a new request on `key`. The
+    previous request on the same key is cancelled and waited for, so the
+    body runs alone.
+    """
+    @contextmanager
+    def request(self, key: str, token: CancelToken = None):
+        token = token or CancelToken()
+        with self._lock:
+            slot = self._slots.setdefault(key, _Slot())
+            slot.users += 1
+            previous, slot.token = slot.token, token
+        if previous is not None and previous.cancel("superseded"):
+            self.superseded += 1
+
+        try:
+            with slot.lock:
+                yield token
+        finally:
+            with self._lock:
+                slot.users -= 1
+                if slot.token is token:
+                    slot.token = None
+                if slot.users == 0:
+                    del self._slots[key]
+
+    def cancel(self, key: str, reason: str = "disconnected") -> bool:
+        """Cancels the current request on key, if any."""
+        with self._lock:
+            slot = self._slots.get(key)
+            token = slot.token if slot is not None else None
+        return token is not None and token.cancel(reason)
@@ -0,0 +1,289 @@
+# services/chat.py
+
+"""
+Turn orchestration shared by the Gradio UI (app/app.py) and the HTTP API
+(app/api.py):
+    pipeline -> guardrails -> build_messages -> LLM -> state update
+"""
+
+import os
+import threading
+
+from core.conversation import ConversationManager
+from core.prompting import OUTPUT_LIMITS, build_messages
+from services.llm import LLMClient
+from services.prefetch import get_prefetcher
+from services.usage import estimate_tokens
+
+
+FALLBACK_OUTPUT = (
+    "⚠️ *Modo fallback activado*\n\n"
+    "Hubo un problema al conectarme con el modelo. "
+    "Por favor, intenta nuevamente en unos momentos."
+)
+
+BUDGET_OUTPUT = (
+    "Has alcanzado el límite de tokens de esta sesión. "
+    "Reinicia la conversación o intenta más tarde."
+)
+
+# Max prompt + completion tokens per session (0 = unlimited)
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))
+
+# Cut answers that outgrow their prompt's OutputLimit (0 = only max_tokens)
+ENFORCE_OUTPUT_LIMITS = os.getenv("OUTPUT_LIMITS", "1") not in ("0", "false", "no")
+
+# Process-wide LLM client, created on the first request that needs it
+_llm = None
+_llm_lock = threading.Lock()
+
+def get_llm() -> LLMClient:
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = LLMClient()
+    return _llm
+
+def llm_metrics() -> dict:
+    """Metrics of the shared client, empty if it was never created."""
+    return _llm.metrics() if _llm is not None else {}
+
+def llm_usage_report() -> dict:
+    """Per intent / model usage and prompt growth of the shared client."""
+    return _llm.usage_report() if _llm is not None else {}
+
+def llm_snapshot() -> dict:
+    """Raw counters of the shared client, for cross-worker aggregation."""
+    return _llm.snapshot() if _llm is not None else {}
+
+
+"""
+Loads the intent classifier (and NumPy) in a background thread at server
+startup, so the first plain-text message doesn't pay for it and startup
+doesn't wait for it.
+"""
+def preload_intents() -> threading.Thread:
+    def load():
+        from core.intent import default_classifier
+        default_classifier()
+
+    thread = threading.Thread(target=load, name="intent-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+"""OutputLimit for the prompt, or None (no limit or limits disabled)."""
+def output_limit(prompt_key: str):
+    return OUTPUT_LIMITS.get(prompt_key) if ENFORCE_OUTPUT_LIMITS else None
+
+
+"""
+Runs the conversation pipeline for one user message.
+Returns (intent, messages, direct_output, limit):
+- messages is the LLM message list, or None when the turn is answered
+  without the model (guardrail block, suggestion, session limit)
+- direct_output is the answer for those cases
+- limit is the OutputLimit for the LLM call (see output_limit)
+"""
+def prepare_turn(conv_state, user_input: str, span):
+    with span.stage("pipeline"):
+        intent, prompt_key, history_for_llm, payload = conv_state.pipeline(user_input)
+    span.annotate(intent=intent, prompt_key=prompt_key)
+
+    #Intent handling
+    match intent:
+        case "BLOCKED":
+            #NEVER calls the LLM. Never log the raw input, only its size
+            span.log("guardrail", level="warning", input_chars=len(user_input or ""))
+            return intent, None, payload, None
+        case "SUGGESTION":
+            return intent, None, payload, None
+        case "LIMIT_REACHED":
+            span.log("limit", reason="Conversation reset due to turn limit")
+            return intent, None, payload, None
+
+    #Normal flow
+    with span.stage("build_messages"):
+        messages = build_messages(prompt_key, history_for_llm, user_input,
+                                  conv_state.recall, conv_state.recall_top_k)
+    return intent, messages, None, output_limit(prompt_key)
+
+
+"""Replaces missing or connection-error outputs with the fallback message."""
+def resolve_output(assistant_output, span) -> str:
+    if (assistant_output is None or "Hubo un problema al conectarme" in assistant_output):
+        span.log("fallback", level="warning", reason="LLM service unavailable")
+        return FALLBACK_OUTPUT
+    return assistant_output
+
+
+"""
+True when the call could push the session past its token budget: tokens
+already used + estimated prompt + the full completion allowance (max_tokens).
+Checked before calling Groq, so a refused turn costs nothing.
+"""
+def over_budget(conv_state, messages, llm, token_budget: int = None, count: bool = True) -> bool:
+    budget = SESSION_TOKEN_BUDGET if token_budget is None else token_budget
+    if budget <= 0:
+        return False
+    needed = estimate_tokens(messages) + llm.max_tokens
+    if conv_state.tokens_used + needed > budget:
+        if count:
+            llm.usage.block_budget()
+        return True
+    return False
+
+
+"""
+Accounting arguments for LLMClient.generate/stream: usage is keyed by intent
+and session, and charged to the session through add_usage.
+"""
+def usage_kwargs(conv_state, intent: str, messages) -> dict:
+    #History messages sent: all but the system messages and the current input
+    history_len = sum(1 for m in messages if m["role"] != "system") - 1
+    return {
+        "intent": intent,
+        "session_id": conv_state.session_id,
+        "trimmed": max(0, 2 * conv_state.turn_count - history_len),
+        "on_usage": conv_state.add_usage,
+    }
+
+
+"""
+Stores the turn in the conversation state and returns the text shown to the
+user (turn indicator + limit warning + answer).
+"""
+def finish_turn(conv_state, user_input: str, assistant_output: str) -> str:
+    # Update internal conversation state
+    conv_state.update_state(user_input, assistant_output)
+
+    #Turn counter per interaction
+    turn_now = conv_state.turn_count
+    turn_indicator = f"[Turno {turn_now}/{conv_state.max_turns}]\n\n"
+
+    #Warning if close to session limit
+    remaining= conv_state.max_turns - turn_now
+    limit_warning= (f"Quedan {remaining} turnos antes de reiniciar la sesión.\n\n"
+        if remaining <= 3 else "")
+
+    return turn_indicator + limit_warning + assistant_output
+
+
+"""Logs a turn dropped by cancellation. Returns (intent, None)."""
+def cancelled_turn(span, cancel, intent):
+    span.annotate(cancelled=cancel.reason)
+    span.log("cancelled", reason=cancel.reason)
+    return intent, None
+
+
+"""
+Speculative prefetch after a SUGGESTION turn (see services/prefetch.py):
+runs the expected command through a copy of the session, so the real state
+is untouched, and starts its LLM call in the background. Only called after
+the suggestion turn is stored, so the history matches the next turn's.
+"""
+def speculate(conv_state, user_input: str, llm, prefetcher, token_budget: int = None) -> bool:
+    command = conv_state.suggested_command(user_input)
+    if command is None:
+        return False
+
+    shadow = ConversationManager.from_dict(conv_state.to_dict(recall=False))
+    shadow.recall = conv_state.recall    # only searched, never updated by pipeline()
+    intent, prompt_key, history, _ = shadow.pipeline(command)
+    if intent in ("BLOCKED", "SUGGESTION", "LIMIT_REACHED"):
+        return False
+
+    messages = build_messages(prompt_key, history, command, shadow.recall, shadow.recall_top_k)
+    if over_budget(conv_state, messages, llm, token_budget, count=False):
+        return False
+
+    kwargs = usage_kwargs(conv_state, intent, messages)
+    limit = output_limit(prompt_key)
+    def call(on_usage, cancel):
+        return llm.generate(messages, **{**kwargs, "on_usage": on_usage, "cancel": cancel},
+                            limit=limit)
+
+    return prefetcher.start(conv_state.session_id, messages, call)
+
+
+"""
+Complete turn, shared by the blocking and the streaming callers.
+Returns (intent, final_output).
+With a CancelToken (services/cancel.py), a turn cancelled before or during
+the LLM call is dropped: the state is left untouched and final_output is None.
+Streaming callers pass on_intent(intent), called once the pipeline has run,
+and on_delta(text): the LLM answer is then streamed through it, and answers
+that don't come from a live LLM call (guardrail, suggestion, prefetch,
+budget, fallback) are sent through it in one piece. final_output stays the
+authoritative text (turn indicator included).
+"""
+def run_turn(conv_state, user_input: str, span, llm_factory=get_llm, token_budget: int = None,
+             prefetcher=None, cancel=None, on_delta=None, on_intent=None):
+    if cancel is not None and cancel.cancelled:
+        return cancelled_turn(span, cancel, None)
+
+    prefetcher = prefetcher or get_prefetcher()
+    intent, messages, assistant_output, limit = prepare_turn(conv_state, user_input, span)
+    if on_intent is not None:
+        on_intent(intent)
+    streamed = False
+    prefetched = None
+    if prefetcher is not None:
+        with span.stage("prefetch"):
+            prefetched = prefetcher.take(conv_state.session_id, messages, cancel)
+        if cancel is not None and cancel.cancelled:
+            return cancelled_turn(span, cancel, intent)
+
+    if prefetched is not None:
+        #Speculative call matched: its tokens are charged to the session now
+        assistant_output, (prompt_tokens, completion_tokens) = prefetched
+        conv_state.add_usage(prompt_tokens, completion_tokens)
+        span.annotate(prefetch="hit")
+        assistant_output = resolve_output(assistant_output, span)
+
+    elif messages is not None:
+        # Send request to Groq (client construction is timed apart: the first
+        # request pays for importing and creating it)
+        with span.stage("llm_client"):
+            try:
+                llm = llm_factory()
+            except ValueError:
+                #Missing GROQ_API_KEY: serve the fallback instead of failing the request
+                llm = None
+
+        if llm is None:
+            assistant_output = None
+        elif over_budget(conv_state, messages, llm, token_budget):
+            span.log("budget", level="warning", tokens_used=conv_state.tokens_used)
+            assistant_output = BUDGET_OUTPUT
+        elif on_delta is None:
+            with span.stage("generate"):
+                assistant_output = llm.generate(messages, cancel=cancel, limit=limit,
+                                                **usage_kwargs(conv_state, intent, messages))
+        else:
+            parts = []
+            with span.stage("generate"):
+                for delta in llm.stream(messages, cancel=cancel, limit=limit,
+                                        **usage_kwargs(conv_state, intent, messages)):
+                    parts.append(delta)
+                    on_delta(delta)
+            assistant_output = "".join(parts) or None
+            streamed = assistant_output is not None
+        if cancel is not None and cancel.cancelled:
+            #A partial streamed answer is dropped too, the turn is not stored
+            return cancelled_turn(span, cancel, intent)
+        assistant_output = resolve_output(assistant_output, span)
+
+    if on_delta is not None and not streamed:
+        on_delta(assistant_output)
+    final_output = finish_turn(conv_state, user_input, assistant_output)
+
+    if intent == "SUGGESTION" and prefetcher is not None:
+        try:
+            if speculate(conv_state, user_input, llm_factory(), prefetcher, token_budget):
+                span.annotate(prefetch="started")
+        except ValueError:
+            pass    # no API key, nothing to prefetch
+
+    return intent, final_output
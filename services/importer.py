@@ -0,0 +1,230 @@
+# services/importer.py
+
+"""
+Bulk import of notes and reminders from CSV or JSONL files.
+
+Entries are read as a stream, cleaned with the same sanitizer as chat input
+(core.prompting.sanitize_input), reminders are dated with the pipeline's
+parser (core.dates.parse_reminder_date), and rows are written to
+SQLiteNotesStore one transaction per batch. The LLM is never called.
+Memory stays constant whatever the file size: only one batch is held at a time.
+
+Input rows need a text and a type (note/nota or reminder/recordatorio):
+    CSV:   columns "type" (or "tipo") and "text" (or "texto", "content")
+    JSONL: {"type": "reminder", "text": "pagar la luz el 5 de diciembre"}
+Rows without a type use --type, or the slash-command the text starts with
+("/nota ...", "/recordatorio ...").
+
+Scope: imported rows are only stored. The chat (/vernota, /agenda) doesn't
+read SQLiteNotesStore yet, and --owner is a free label not tied to any
+session.
+
+Run from the repo root:
+    python -m services.importer notas.csv [--db copilot_state.db] [--owner ID]
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+from core.dates import parse_reminder_date
+from core.prompting import BLOCKED_INPUT, EMPTY_INPUT, sanitize_input
+
+KINDS = {
+    "note": "note", "nota": "note", "/nota": "note",
+    "reminder": "reminder", "recordatorio": "reminder", "/recordatorio": "reminder",
+}
+
+TYPE_FIELDS = ("type", "tipo", "kind")
+TEXT_FIELDS = ("text", "texto", "content", "contenido")
+
+
+def _field(row: dict, names):
+    for name in names:
+        value = row.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+"""
+Yields (type, text) per row of a CSV or JSONL stream. Unreadable JSONL
+lines yield (None, None) and are counted as malformed by the importer.
+"""
+def read_entries(stream, fmt: str):
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            row = {(k or "").strip().lower(): v for k, v in row.items()}
+            yield _field(row, TYPE_FIELDS), _field(row, TEXT_FIELDS)
+    elif fmt == "jsonl":
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield None, None
+                continue
+            if not isinstance(row, dict):
+                yield None, None
+                continue
+            yield _field(row, TYPE_FIELDS), _field(row, TEXT_FIELDS)
+    else:
+        raise ValueError(f"unsupported format: {fmt}")
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0
+        self.notes = 0
+        self.reminders = 0
+        self.batches = 0
+        self.skipped = Counter()     # reason -> rows
+        self._start = time.perf_counter()
+
+    @property
+    def imported(self) -> int:
+        return self.notes + self.reminders
+
+    @property
+    def elapsed_secs(self) -> float:
+        return time.perf_counter() - self._start
+
+    @property
+    def rows_per_sec(self) -> float:
+        elapsed = self.elapsed_secs
+        return self.read / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "read": self.read,
+            "imported": self.imported,
+            "notes": self.notes,
+            "reminders": self.reminders,
+            "skipped": sum(self.skipped.values()),
+            "skipped_by_reason": dict(self.skipped),
+            "batches": self.batches,
+            "elapsed_secs": round(self.elapsed_secs, 3),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+        }
+
+
+"""
+Validates one entry. Returns ("note", text, None), ("reminder", text,
+"YYYY-MM-DD") or (None, reason, None) when the row is skipped.
+"""
+def prepare_entry(kind, text, default_kind: str = None, today: datetime = None):
+    if not isinstance(text, str):
+        return None, "malformed", None
+
+    #Chat-style rows ("/nota ...") carry their type in the text
+    command, _, rest = text.strip().partition(" ")
+    if command.startswith("/") and command.lower() in KINDS:
+        kind, text = kind or command, rest
+    kind = KINDS.get(str(kind or default_kind or "").strip().lower())
+    if kind is None:
+        return None, "unknown_type", None
+
+    clean = sanitize_input(text)
+    if clean == EMPTY_INPUT or not clean:
+        return None, "empty", None
+    if clean == BLOCKED_INPUT:
+        return None, "blocked", None
+    if kind == "note":
+        return "note", clean, None
+
+    due, error = parse_reminder_date(clean, today)
+    if error is not None:
+        return None, f"date_{error}", None
+    return "reminder", clean, due.date().isoformat()
+
+
+"""
+Imports (type, text) entries into a SQLiteNotesStore, batch_size rows per
+transaction. on_progress(stats) is called after every batch.
+"""
+def import_entries(entries, store, owner: str = "default", batch_size: int = 1000,
+                   default_kind: str = None, source: str = None, on_progress=None) -> ImportStats:
+    stats = ImportStats()
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            break
+
+        today = datetime.now()
+        notes, reminders = [], []
+        for kind, text in batch:
+            kind, value, due = prepare_entry(kind, text, default_kind, today)
+            if kind == "note":
+                notes.append((owner, value, source))
+            elif kind == "reminder":
+                reminders.append((owner, value, due, source))
+            else:
+                stats.skipped[value] += 1
+
+        store.insert_many(notes, reminders)
+        stats.read += len(batch)
+        stats.notes += len(notes)
+        stats.reminders += len(reminders)
+        stats.batches += 1
+        if on_progress is not None:
+            on_progress(stats)
+    return stats
+
+
+"""
+Opens the file (or stdin for "-") and imports it. The format comes from the
+extension unless fmt is given.
+"""
+def import_file(path: str, store, fmt: str = None, **kwargs) -> ImportStats:
+    if fmt is None:
+        fmt = "csv" if path.lower().endswith(".csv") else "jsonl"
+    if path == "-":
+        return import_entries(read_entries(sys.stdin, fmt), store, **kwargs)
+    kwargs.setdefault("source", os.path.basename(path))
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return import_entries(read_entries(f, fmt), store, **kwargs)
+
+
+def _progress_printer(interval_secs: float = 0.5):
+    last = [0.0]
+
+    def report(stats):
+        now = time.perf_counter()
+        if now - last[0] >= interval_secs:
+            last[0] = now
+            print(f"\r{stats.read:>10,} leídas  {stats.imported:>10,} importadas  "
+                  f"{sum(stats.skipped.values()):>8,} omitidas  {stats.rows_per_sec:>9,.0f} filas/s",
+                  end="", file=sys.stderr, flush=True)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from services.store import SQLiteNotesStore
+
+    parser = argparse.ArgumentParser(
+        description="Bulk import of notes and reminders into SQLite. Imported rows are stored "
+                    "only: /vernota and /agenda in the chat don't read them yet.")
+    parser.add_argument("path", help="CSV or JSONL file ('-' for stdin)")
+    parser.add_argument("--format", choices=("csv", "jsonl"))
+    parser.add_argument("--db", default=os.getenv("COPILOT_STATE_DB", "copilot_state.db"))
+    parser.add_argument("--owner", default="default",
+                        help="label stored with each row (not tied to a chat session)")
+    parser.add_argument("--type", choices=("note", "reminder"),
+                        help="type for rows that don't have one")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    stats = import_file(args.path, SQLiteNotesStore(args.db), fmt=args.format, owner=args.owner,
+                        batch_size=args.batch_size, default_kind=args.type,
+                        on_progress=_progress_printer())
+    print(file=sys.stderr)
+    print(json.dumps(stats.as_dict(), ensure_ascii=False, indent=2))
@@ -6,9 +6,42 @@ Handles timeouts, retries, backoff and error normalization.
 """
 
 import os
+import threading
 import time
-from groq import Groq
-import httpx
+from types import SimpleNamespace
+
+from services.usage import UsageLedger, estimate_tokens
+
+# The Groq SDK (with httpx and pydantic behind it) is imported on first
+# client construction, not at module import, to keep cold starts cheap.
+Groq = None
+
+
+def _groq_class():
+    global Groq
+    if Groq is None:
+        from groq import Groq as _Groq
+        Groq = _Groq
+    return Groq
+
+
+"""
+Average, p50 and p95 latency in milliseconds from a list of seconds.
+"""
+def summarize_latencies(latencies: list) -> dict:
+    if latencies:
+        p50 = sorted(latencies)[len(latencies) // 2]
+        p95 = sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+    else:
+        p50 = p95 = 0
+
+    return {
+        "avg_latency_ms": round(sum(latencies) / len(latencies) * 1000, 2)
+        if latencies
+        else 0,
+        "p50_latency_ms": round(p50 * 1000, 2),
+        "p95_latency_ms": round(p95 * 1000, 2),
+    }
 
 
 class LLMClient:
@@ -19,7 +52,7 @@ class LLMClient:
             raise ValueError("GROQ_API_KEY not found in environment variables.")
 
         # Initialize Groq client
-        self.client = Groq(api_key=api_key)
+        self.client = _groq_class()(api_key=api_key)
 
         # Recommended default model
         self.model = os.getenv("MODEL_NAME", "meta-llama/llama-4-maverick-17b-128e-instruct")
@@ -34,12 +67,21 @@ class LLMClient:
         self.max_retry = 2
         self.timeout_secs = 12  
 
-        #Metric storage
+        #Metric storage (one client serves every request thread: updated under _lock)
+        self._lock= threading.Lock()
         self.latencies=[]
         self.retry_count= 0
         self.fallback_count= 0
         self.total_calls= 0 
         self.total_tokens= 0
+        self.prompt_tokens= 0
+        self.completion_tokens= 0
+        self.cost_usd= 0.0
+        self.usage= UsageLedger()    # per intent / model / session breakdown
+        self.cancelled= {}           # reason -> calls aborted by a CancelToken
+        self.truncated= {}           # reason -> answers cut short by an OutputLimit
+        self.truncated_chars= 0      # received but dropped after the cut
+        self.truncated_tokens_saved= 0   # max_tokens left unused at the cut (upper bound)
 
 
     """
@@ -50,12 +92,34 @@ class LLMClient:
         - HTTP 401/403 → clave inválida, fallback inmediato
         - HTTP 500/503 → retry con backoff
         - Timeout → tratado como 500 (retry)
+
+    Optional accounting arguments:
+        - intent / session_id: keys for the usage ledger
+        - trimmed: history messages left out by the context window
+        - on_usage(prompt_tokens, completion_tokens): called after a
+          successful call (used to charge the session's token budget)
+
+    cancel (services.cancel.CancelToken): the answer is streamed, so a
+    cancellation closes the open HTTP response instead of waiting for Groq
+    to finish; it is also checked before each attempt and during backoff.
+    A cancelled call returns None (tokens already spent are still recorded).
+
+    limit (core.output.OutputLimit): the answer is streamed and cut as soon
+    as it reaches the limit (see stream()).
     """
 
-    def generate(self, messages: list) -> str:
+    def generate(self, messages: list, intent: str = None, session_id: str = None,
+                 trimmed: int = 0, on_usage=None, cancel=None, limit=None) -> str:
+        if limit is not None or cancel is not None:
+            parts = list(self.stream(messages, intent, session_id, trimmed, on_usage, cancel, limit))
+            if cancel is not None and cancel.cancelled:
+                return None
+            return "".join(parts) or None
 
-        self.total_calls +=1
+        self._count("total_calls")
         for attempt in range(self.max_retry + 1):
+            if cancel is not None and cancel.cancelled:
+                return self._cancelled(cancel)
             try:
                 start = time.time()
 
@@ -72,78 +136,290 @@ class LLMClient:
 
                 # Latency (used later in README metrics)
                 latency = time.time() - start
-                self.latencies.append(latency)
+                with self._lock:
+                    self.latencies.append(latency)
 
                 #Update token usage 
-                try: 
-                    usage= res.usage
-                    self.total_tokens += usage.total_tokens
-                except: 
-                    pass
+                self._record_usage(getattr(res, "usage", None), messages, intent,
+                                   session_id, trimmed, on_usage)
 
+                if cancel is not None and cancel.cancelled:
+                    return self._cancelled(cancel)
                 return res.choices[0].message.content
 
-            except httpx.HTTPStatusError as e :
-                status= e.response.status_code
-
-                match status: 
-                    case 400:
-                        self.fallback_count += 1
-                        return ("La solicitud no es válida. Revisa el formato, comando o parámetros.")
-                    case 401 | 403: 
-                        self.fallback_count += 1
-                        return ("La clave API no es válida o no tengo permiso para acceder al modelo. "
-                                "No puedo procesar solicitudes.")
-                    case 500 | 503: 
-                        if attempt < self.max_retry:
-                            self.retry_count += 1 
-                            time.sleep(1 * (2 ** attempt))
-                            continue
-                        self.fallback_count += 1
-                        return ("El servicio del modelo está experimentando problemas. "
-                                "Intenta nuevamente más tarde.")
-                    case _: 
-                        self.fallback_count += 1
-                        return "Error inesperado al procesar la solicitud."
-
-            except httpx.TimeoutException:
-                if attempt < self.max_retry: 
-                    self.retry_count += 1 
-                    time.sleep(1*(2 ** attempt))
-                    continue 
-                self.fallback_count += 1
-                return "El servidor tardó demasiado en responder. Intenta de nuevo"
-            
-            except Exception:
-                self.fallback_count += 1 
-                return (
-                    "Hubo un problema al conectarme con el modelo. "
-                    "Por favor, intenta nuevamente en unos momentos."
+            except Exception as e:
+                output = self._error_output(e, attempt, cancel)
+                if output is None:
+                    continue
+                return output
+        if cancel is not None and cancel.cancelled:
+            return self._cancelled(cancel)
+
+    def _cancelled(self, cancel):
+        reason = cancel.reason or "cancelled"
+        with self._lock:
+            self.cancelled[reason] = self.cancelled.get(reason, 0) + 1
+        return None
+
+    def _count(self, counter: str, n: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    #Backoff that a cancellation cuts short
+    def _backoff(self, attempt: int, cancel):
+        secs = 1 * (2 ** attempt)
+        if cancel is not None:
+            cancel.wait(secs)
+        else:
+            time.sleep(secs)
+
+
+    """
+    Accumulates the token usage reported by Groq. Responses without numeric
+    usage fields are not counted.
+    """
+    def _record_usage(self, usage, messages, intent, session_id, trimmed, on_usage):
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        if not isinstance(prompt, int) or not isinstance(completion, int):
+            return
+
+        total = getattr(usage, "total_tokens", None) or (prompt + completion)
+        cost = self.usage.cost(self.model, prompt, completion)
+        with self._lock:
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+            self.total_tokens += total
+            self.cost_usd += cost
+
+        history_len = sum(1 for m in messages if m["role"] != "system") - 1
+        self.usage.record(self.model, prompt, completion, intent=intent, session_id=session_id,
+                          history_len=max(history_len, 0), trimmed=trimmed)
+        if on_usage is not None:
+            on_usage(prompt, completion)
+
+
+    """
+    Maps an exception raised by the Groq call to the user-facing fallback.
+    Returns None when the attempt should be retried (after the backoff sleep),
+    or when the call was cancelled.
+    """
+    def _error_output(self, error: Exception, attempt: int, cancel=None):
+        import httpx  # already loaded by the Groq SDK at this point
+
+        if cancel is not None and cancel.cancelled:
+            return None
+
+        if isinstance(error, httpx.HTTPStatusError):
+            status= error.response.status_code
+
+            match status: 
+                case 400:
+                    self._count("fallback_count")
+                    return ("La solicitud no es válida. Revisa el formato, comando o parámetros.")
+                case 401 | 403: 
+                    self._count("fallback_count")
+                    return ("La clave API no es válida o no tengo permiso para acceder al modelo. "
+                            "No puedo procesar solicitudes.")
+                case 500 | 503: 
+                    if attempt < self.max_retry:
+                        self._count("retry_count")
+                        self._backoff(attempt, cancel)
+                        return None
+                    self._count("fallback_count")
+                    return ("El servicio del modelo está experimentando problemas. "
+                            "Intenta nuevamente más tarde.")
+                case _: 
+                    self._count("fallback_count")
+                    return "Error inesperado al procesar la solicitud."
+
+        if isinstance(error, httpx.TimeoutException):
+            if attempt < self.max_retry: 
+                self._count("retry_count")
+                self._backoff(attempt, cancel)
+                return None
+            self._count("fallback_count")
+            return "El servidor tardó demasiado en responder. Intenta de nuevo"
+
+        self._count("fallback_count")
+        return (
+            "Hubo un problema al conectarme con el modelo. "
+            "Por favor, intenta nuevamente en unos momentos."
+        )
+
+
+    """
+    Streaming variant of generate(): yields text deltas as they arrive.
+    Errors before the first delta follow the same retry/fallback rules and
+    yield the fallback text; an error after the first delta ends the stream
+    (the partial answer is kept) and counts as a fallback.
+    Cancelling closes the open HTTP stream and ends the generator without
+    a fallback.
+    With an OutputLimit, deltas go through its checker: once the answer
+    reaches the limit the stream is closed (no more tokens are generated)
+    and the cut is counted in the truncation metrics.
+    """
+    def stream(self, messages: list, intent: str = None, session_id: str = None,
+               trimmed: int = 0, on_usage=None, cancel=None, limit=None):
+        self._count("total_calls")
+        for attempt in range(self.max_retry + 1):
+            if cancel is not None and cancel.cancelled:
+                self._cancelled(cancel)
+                return
+            started = False
+            try:
+                start = time.time()
+
+                chunks = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    top_p=self.top_p,
+                    max_tokens=self.max_tokens,
+                    seed=self.seed,
+                    timeout=self.timeout_secs,
+                    stream=True,
                 )
-            
+                if cancel is not None and hasattr(chunks, "close"):
+                    cancel.on_cancel(chunks.close)
+                checker = limit.checker() if limit is not None else None
+                received = 0
+                usage_seen = False
+
+                for chunk in chunks:
+                    if cancel is not None and cancel.cancelled:
+                        break
+                    #Groq reports usage on the last chunk (x_groq.usage)
+                    usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                    if usage is not None:
+                        usage_seen = True
+                        self._record_usage(usage, messages, intent, session_id, trimmed, on_usage)
+
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        started = True
+                        received += len(delta)
+                        if checker is not None:
+                            delta = checker.feed(delta)
+                        if delta:
+                            yield delta
+                        if checker is not None and checker.done:
+                            self._truncate(chunks, checker, received)
+                            if not usage_seen:
+                                self._estimate_usage(messages, received, intent, session_id,
+                                                     trimmed, on_usage)
+                            break
+
+                if cancel is not None and cancel.cancelled:
+                    self._cancelled(cancel)
+                    return
+                if checker is not None:
+                    tail = checker.flush()
+                    if tail:
+                        yield tail
+                latency = time.time() - start
+                with self._lock:
+                    self.latencies.append(latency)
+                return
+
+            except Exception as e:
+                if cancel is not None and cancel.cancelled:
+                    self._cancelled(cancel)
+                    return
+                if started:
+                    self._count("fallback_count")
+                    return
+                output = self._error_output(e, attempt, cancel)
+                if output is None:
+                    continue
+                yield output
+                return
+        if cancel is not None and cancel.cancelled:
+            self._cancelled(cancel)
+
+    """
+    Closes a stream cut by its OutputLimit and counts the cut: by rule, the
+    characters dropped after it and the completion allowance left unused.
+    """
+    def _truncate(self, chunks, checker, received: int):
+        if hasattr(chunks, "close"):
+            chunks.close()
+        with self._lock:
+            self.truncated[checker.reason] = self.truncated.get(checker.reason, 0) + 1
+            self.truncated_chars += checker.dropped_chars
+            self.truncated_tokens_saved += max(0, self.max_tokens - received // 4)
+
+    #Groq only reports usage on the last chunk, which a cut stream never gets
+    def _estimate_usage(self, messages, received: int, intent, session_id, trimmed, on_usage):
+        usage = SimpleNamespace(prompt_tokens=estimate_tokens(messages),
+                                completion_tokens=max(1, received // 4))
+        self._record_usage(usage, messages, intent, session_id, trimmed, on_usage)
+
     """
     Returns a dictionary summarizing all metrics collected so far.
     Intended only for developer debugging or README reporting.
     """        
 
     def metrics(self):
-        if self.latencies:
-            p50 = sorted(self.latencies)[len(self.latencies) // 2]
-            p95 = sorted(self.latencies)[max(0, int(len(self.latencies) * 0.95) - 1)]
-        else:
-            p50 = p95 = 0
-
-        return {
-            "total_calls": self.total_calls,
-            "avg_latency_ms": round(sum(self.latencies) / len(self.latencies) * 1000, 2)
-            if self.latencies
-            else 0,
-            "p50_latency_ms": round(p50 * 1000, 2),
-            "p95_latency_ms": round(p95 * 1000, 2),
-            "total_retries": self.retry_count,
-            "total_fallbacks": self.fallback_count,
-            "total_tokens": self.total_tokens,
-        }
+        budget_blocked = self.usage.budget_blocked
+        with self._lock:
+            return {
+                "total_calls": self.total_calls,
+                **summarize_latencies(self.latencies),
+                "total_retries": self.retry_count,
+                "total_fallbacks": self.fallback_count,
+                "total_tokens": self.total_tokens,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cost_usd": round(self.cost_usd, 6),
+                "budget_blocked": budget_blocked,
+                **self._cancel_counters(),
+                **self._truncation_counters(),
+                "truncated_rate": round(sum(self.truncated.values()) / self.total_calls, 4)
+                if self.total_calls
+                else 0,
+            }
+
+    #Caller holds _lock
+
+    def _cancel_counters(self) -> dict:
+        counters = {"total_cancelled": sum(self.cancelled.values())}
+        counters.update({f"cancelled_{reason}": n for reason, n in self.cancelled.items()})
+        return counters
+
+    #Caller holds _lock
+    def _truncation_counters(self) -> dict:
+        counters = {"total_truncated": sum(self.truncated.values())}
+        counters.update({f"truncated_{reason}": n for reason, n in self.truncated.items()})
+        counters["truncated_chars"] = self.truncated_chars
+        counters["truncated_tokens_saved"] = self.truncated_tokens_saved
+        return counters
+
+    def usage_report(self) -> dict:
+        """Per intent / model breakdown and prompt growth vs history length."""
+        return self.usage.report()
+
+
+    """
+    Raw counters and latency samples, for aggregating metrics across worker
+    processes (see services/store.py). Counters are summed, lists concatenated.
+    """
+    def snapshot(self, max_latencies: int = 1000) -> dict:
+        budget_blocked = self.usage.budget_blocked
+        with self._lock:
+            return {
+                "total_calls": self.total_calls,
+                "total_retries": self.retry_count,
+                "total_fallbacks": self.fallback_count,
+                "total_tokens": self.total_tokens,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cost_usd": self.cost_usd,
+                "budget_blocked": budget_blocked,
+                **self._cancel_counters(),
+                **self._truncation_counters(),
+                "latencies": self.latencies[-max_latencies:],
+            }
 
     def report(self):
         """Pretty-print metrics for local debugging."""
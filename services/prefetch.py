@@ -0,0 +1,212 @@
+# services/prefetch.py
+
+"""
+Speculative prefetch (opt-in, SPECULATIVE_PREFETCH=1).
+
+After a SUGGESTION turn the user usually resends the same text with the
+suggested slash-command. The likely command's LLM call is started in the
+background right away; when the next turn's messages match, its result is
+served instead of waiting for a new call.
+
+Each session holds at most one speculation. It is consumed (hit) or thrown
+away (wasted) on the session's next turn, or when it goes stale; a wasted
+call still running is cancelled (see services/cancel.py).
+Speculative calls are capped by max_inflight and max_per_minute.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from services.cancel import CancelToken
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+"""
+Same history and system prompt, and the same last user message up to case
+and whitespace.
+"""
+def messages_match(expected, actual) -> bool:
+    if len(expected) != len(actual):
+        return False
+    if list(expected[:-1]) != list(actual[:-1]):
+        return False
+    return _normalize(expected[-1]["content"]) == _normalize(actual[-1]["content"])
+
+
+class _Speculation:
+    __slots__ = ("messages", "future", "usage", "cancel", "started_at")
+
+    def __init__(self, messages, future, usage, cancel):
+        self.messages = messages
+        self.future = future
+        self.usage = usage            # [prompt_tokens, completion_tokens]
+        self.cancel = cancel
+        self.started_at = time.monotonic()
+
+
+class Prefetcher:
+    def __init__(self, max_inflight: int = 4, max_per_minute: int = 60,
+                 wait_secs: float = 30, stale_secs: float = 300):
+        self.max_inflight = max_inflight
+        self.max_per_minute = max_per_minute
+        self.wait_secs = wait_secs
+        self.stale_secs = stale_secs
+        self._pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="prefetch")
+        self._entries = {}
+        self._recent = deque()
+        self._inflight = 0
+        self._lock = threading.RLock()
+
+        #Metrics
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+        self.skipped_budget = 0
+        self.wasted_tokens = 0
+
+
+    """
+    Starts call(on_usage, cancel) -> output in the background for this
+    session. Returns False when the cap is reached (no call is made).
+    """
+    def start(self, session_id: str, messages, call) -> bool:
+        with self._lock:
+            self._evict_stale()
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if self._inflight >= self.max_inflight or len(self._recent) >= self.max_per_minute:
+                self.skipped_budget += 1
+                return False
+
+            previous = self._entries.pop(session_id, None)
+            if previous is not None:
+                self._waste(previous)
+
+            usage = [0, 0]
+            def on_usage(prompt_tokens, completion_tokens):
+                usage[0] += prompt_tokens
+                usage[1] += completion_tokens
+
+            cancel = CancelToken()
+            self._inflight += 1
+            self._recent.append(now)
+            self.started += 1
+            future = self._pool.submit(self._run, call, on_usage, cancel)
+            self._entries[session_id] = _Speculation(list(messages), future, usage, cancel)
+        return True
+
+    def _run(self, call, on_usage, cancel):
+        try:
+            return call(on_usage, cancel)
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+
+    """
+    Called on every turn of a session. Returns (output, (prompt_tokens,
+    completion_tokens)) when the pending speculation matches these messages,
+    otherwise None (a non-matching speculation is counted as wasted).
+    messages=None means the turn needs no LLM call.
+    Waits up to wait_secs for a matching call still running, unless the
+    turn's CancelToken is set first: the speculation is then kept for the
+    session's next turn and None is returned.
+    """
+    def take(self, session_id: str, messages, cancel=None):
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return None
+
+        if messages is None or not messages_match(entry.messages, messages):
+            with self._lock:
+                self.misses += 1
+                self._waste(entry)
+            return None
+
+        timeout = self.wait_secs
+        if cancel is not None and not entry.future.done():
+            wake = threading.Event()
+            entry.future.add_done_callback(lambda _: wake.set())
+            cancel.on_cancel(wake.set)
+            wake.wait(self.wait_secs)
+            if cancel.cancelled and not entry.future.done():
+                with self._lock:
+                    self._entries.setdefault(session_id, entry)
+                return None
+            timeout = 0
+
+        try:
+            output = entry.future.result(timeout=timeout)
+        except Exception:
+            with self._lock:
+                self.misses += 1
+                self._waste(entry)
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return output, tuple(entry.usage)
+
+    #Caller holds the lock
+    def _waste(self, entry):
+        self.wasted += 1
+        if entry.future.cancel():
+            self._inflight -= 1     # still queued, never ran
+        elif entry.future.done():
+            self.wasted_tokens += sum(entry.usage)
+        else:
+            entry.cancel.cancel("wasted")
+            entry.future.add_done_callback(lambda _: self._add_wasted_tokens(entry))
+
+    def _add_wasted_tokens(self, entry):
+        with self._lock:
+            self.wasted_tokens += sum(entry.usage)
+
+    def _evict_stale(self):
+        cutoff = time.monotonic() - self.stale_secs
+        for session_id in [s for s, e in self._entries.items() if e.started_at < cutoff]:
+            self._waste(self._entries.pop(session_id))
+
+    def metrics(self) -> dict:
+        with self._lock:
+            resolved = self.hits + self.misses
+            return {
+                "prefetch_started": self.started,
+                "prefetch_hits": self.hits,
+                "prefetch_misses": self.misses,
+                "prefetch_hit_rate": round(self.hits / resolved, 3) if resolved else 0.0,
+                "prefetch_wasted_calls": self.wasted,
+                "prefetch_wasted_tokens": self.wasted_tokens,
+                "prefetch_skipped_budget": self.skipped_budget,
+                "prefetch_inflight": self._inflight,
+            }
+
+
+_default = None
+_default_lock = threading.Lock()
+
+"""
+Process-wide prefetcher, or None when SPECULATIVE_PREFETCH is not enabled.
+PREFETCH_MAX_INFLIGHT and PREFETCH_MAX_PER_MINUTE cap speculative calls.
+"""
+def get_prefetcher():
+    global _default
+    if os.getenv("SPECULATIVE_PREFETCH", "0") not in ("1", "true", "yes"):
+        return None
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = Prefetcher(
+                    max_inflight=int(os.getenv("PREFETCH_MAX_INFLIGHT", "4")),
+                    max_per_minute=int(os.getenv("PREFETCH_MAX_PER_MINUTE", "60")),
+                )
+    return _default
@@ -0,0 +1,227 @@
+# services/profiling.py
+
+"""
+Slow-request profiling (opt-in).
+
+When PROFILE_SLOW_MS is set, any request that takes longer than the
+threshold is captured as one JSON file holding its stage breakdown
+(the span stages: pipeline, build_messages, prefetch, llm_client, generate;
+time outside them, such as waiting for the session, is "unstaged_ms") and
+its annotations. The files live in a bounded on-disk ring
+(PROFILE_DIR, at most PROFILE_MAX_FILES files shared by all workers; the oldest is
+removed).
+
+With PROFILE_SAMPLING=1, a sampling profiler also records the request
+thread's Python stack every PROFILE_INTERVAL_MS, and the capture includes
+the most frequent stacks in collapsed "a;b;c" form (flamegraph input).
+Sampling runs in a separate thread and never instruments the request path.
+
+Inspect the captures with:
+    python -m services.profiling [PROFILE_DIR]
+"""
+
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of tracked threads with sys._current_frames() from a
+    daemon thread. The thread sleeps while nothing is tracked.
+    """
+    def __init__(self, interval_ms: float = 5.0, max_depth: int = 48):
+        self.interval_secs = interval_ms / 1000
+        self.max_depth = max_depth
+        self._tracked = {}          # thread ident -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.samples = 0
+
+
+    """
+    Samples the calling thread while inside the block; yields the Counter the
+    samples are added to.
+    """
+    @contextmanager
+    def track(self, samples: Counter = None):
+        samples = samples if samples is not None else Counter()
+        ident = threading.get_ident()
+        with self._lock:
+            self._tracked[ident] = samples
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+        try:
+            yield samples
+        finally:
+            with self._lock:
+                self._tracked.pop(ident, None)
+                if not self._tracked:
+                    self._wake.clear()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval_secs)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._tracked.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[self._collapse(frame)] += 1
+                        self.samples += 1
+            del frames
+
+    def _collapse(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+#Tie-breaker for captures written in the same clock tick
+_capture_ids = itertools.count()
+
+
+class ProfileRing:
+    """
+    At most max_files captures in directory, shared by every worker process
+    that writes there. Each capture is a new file named
+    slow-<time_ns>-<pid>-<n>.json (so workers never overwrite each other's) and
+    the oldest files beyond max_files are removed after each write. Writes
+    are atomic (temp file + rename).
+    """
+    def __init__(self, directory: str, max_files: int = 50):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self) -> str:
+        name = f"slow-{time.time_ns():020d}-{os.getpid()}-{next(_capture_ids)}.json"
+        return os.path.join(self.directory, name)
+
+    def files(self) -> list:
+        """Capture files of every worker, oldest first."""
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith("slow-") and name.endswith(".json")]
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def write(self, record: dict) -> str:
+        with self._lock:
+            path = self._path()
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False, default=str)
+            os.replace(tmp, path)
+
+            #Another worker may be pruning the same files
+            for old in self.files()[:-self.max_files]:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+        return path
+
+
+class RequestProfiler:
+    """
+    Glue between telemetry spans and the ring: Span.track() samples the
+    request thread, Span.end() calls capture() with the final duration.
+    """
+    def __init__(self, threshold_ms: float, ring: ProfileRing, sampler: SamplingProfiler = None,
+                 max_stacks: int = 50):
+        self.threshold_ms = threshold_ms
+        self.ring = ring
+        self.sampler = sampler
+        self.max_stacks = max_stacks
+        self.captured = 0
+        self.errors = 0
+
+    @contextmanager
+    def track(self, samples: Counter):
+        if self.sampler is None:
+            yield samples
+            return
+        with self.sampler.track(samples):
+            yield samples
+
+
+    """
+    Writes the capture if the request was slow. Returns its path, or None.
+    Disk errors are counted, never raised into the request.
+    """
+    def capture(self, request_id: str, total_ms: float, stages: dict, fields: dict,
+                samples: Counter = None):
+        if total_ms < self.threshold_ms:
+            return None
+
+        record = {
+            "request_id": request_id,
+            "ts": time.time(),
+            "total_ms": round(total_ms, 3),
+            "threshold_ms": self.threshold_ms,
+            "stages": dict(stages),
+            "unstaged_ms": round(total_ms - sum(stages.values()), 3),
+            "fields": dict(fields),
+        }
+        if self.sampler is not None:
+            samples = samples or Counter()
+            record["interval_ms"] = self.sampler.interval_secs * 1000
+            record["samples"] = sum(samples.values())
+            record["stacks"] = samples.most_common(self.max_stacks)
+
+        try:
+            path = self.ring.write(record)
+        except OSError:
+            self.errors += 1
+            return None
+        self.captured += 1
+        return path
+
+
+"""
+Profiler configured from the environment, or None when PROFILE_SLOW_MS is
+not set: PROFILE_SLOW_MS, PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_SAMPLING,
+PROFILE_INTERVAL_MS.
+"""
+def profiler_from_env():
+    threshold = float(os.getenv("PROFILE_SLOW_MS", "0"))
+    if threshold <= 0:
+        return None
+
+    sampler = None
+    if os.getenv("PROFILE_SAMPLING", "0") in ("1", "true", "yes"):
+        sampler = SamplingProfiler(interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "5")))
+    ring = ProfileRing(os.getenv("PROFILE_DIR", "profiles"),
+                       max_files=int(os.getenv("PROFILE_MAX_FILES", "50")))
+    return RequestProfiler(threshold, ring, sampler)
+
+
+"""
+Prints each capture (oldest first): total, stage breakdown and top stacks.
+"""
+def summarize(directory: str, top: int = 5):
+    for path in ProfileRing(directory).files():
+        with open(path, encoding="utf-8") as f:
+            record = json.load(f)
+        stages = ", ".join(f"{k}={v:.1f}" for k, v in
+                           sorted(record["stages"].items(), key=lambda kv: -kv[1]))
+        print(f"{os.path.basename(path)} req={record['request_id']} "
+              f"total={record['total_ms']:.1f}ms [{stages}] unstaged={record['unstaged_ms']:.1f}")
+        for stack, count in record.get("stacks", [])[:top]:
+            print(f"    {count:5d}  {stack.split(';')[-1]}  ({stack.count(';') + 1} frames)")
+
+
+if __name__ == "__main__":
+    summarize(sys.argv[1] if len(sys.argv) > 1 else os.getenv("PROFILE_DIR", "profiles"))
@@ -0,0 +1,95 @@
+# services/sessions.py
+
+"""
+Server-side conversation sessions for the HTTP API.
+Each session owns a ConversationManager; turns on the same session are
+serialized with a per-session lock, different sessions run in parallel.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from core.conversation import ConversationManager
+
+
+class _Entry:
+    __slots__ = ("conv", "lock", "last_seen")
+
+    def __init__(self, conv: ConversationManager):
+        self.conv = conv
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+
+
+class SessionStore:
+    """
+    In-memory store with idle expiry (ttl_secs) and a size cap
+    (least recently used sessions are evicted first).
+    """
+    def __init__(self, ttl_secs: float = 3600, max_sessions: int = 10000):
+        self.ttl_secs = ttl_secs
+        self.max_sessions = max_sessions
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def create(self) -> str:
+        session_id = self.new_id()
+        with self._lock:
+            self._insert(session_id)
+        return session_id
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            self._expire()
+            return session_id in self._entries
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._entries.pop(session_id, None) is not None
+
+
+    """
+    Yields the session's ConversationManager (created if missing) while
+    holding its lock, so concurrent turns of one session never interleave.
+    """
+    @contextmanager
+    def session(self, session_id: str):
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(session_id)
+            if entry is None:
+                entry = self._insert(session_id)
+            else:
+                self._entries.move_to_end(session_id)
+            entry.last_seen = time.monotonic()
+
+        with entry.lock:
+            yield entry.conv
+
+    def _insert(self, session_id: str) -> _Entry:
+        conv = ConversationManager()
+        conv.session_id = session_id
+        entry = _Entry(conv)
+        self._entries[session_id] = entry
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+        return entry
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_secs
+        while self._entries:
+            oldest_id, oldest = next(iter(self._entries.items()))
+            if oldest.last_seen >= cutoff:
+                break
+            del self._entries[oldest_id]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,444 @@
+# services/store.py
+
+"""
+SQLite-backed shared state for running several worker processes.
+- SQLiteSessionStore: conversation sessions any worker can resume
+  (same interface as services.sessions.SessionStore).
+- SQLiteMetricsCollector: each worker publishes its LLM counters, and any
+  worker can read the totals aggregated across all of them.
+- SQLiteNotesStore: persistent notes and reminders (bulk import target only;
+  the chat pipeline doesn't read it yet).
+
+The database runs in WAL mode so readers never block the single writer.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from core.conversation import ConversationManager
+from core.recall import RecallIndex
+from services.llm import summarize_latencies
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=10000")
+    return conn
+
+
+class SessionBusy(TimeoutError):
+    """The session is held by another worker's turn (or this turn lost it)."""
+
+
+class _SQLiteBase:
+    """One connection per thread, schema created on first use."""
+    SCHEMA = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+
+class SQLiteSessionStore(_SQLiteBase):
+    """
+    Sessions are stored as JSON (ConversationManager.to_dict). A turn holds a
+    short lease on its session row instead of a database lock, so two
+    workers never run the same session concurrently while the LLM call is
+    in flight, and other sessions are never blocked. A background thread
+    renews the leases held by this process every lease_secs / 3, so a long
+    turn keeps its session; a worker that dies loses it after lease_secs.
+
+    Recall documents (core/recall.py) live in their own table, one row per
+    exchange, written once. Each process keeps the built RecallIndex of
+    recent sessions (recall_cache) and only loads the rows other workers
+    added since, so a turn's cost doesn't grow with the session's length.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id          TEXT PRIMARY KEY,
+            state       TEXT NOT NULL,
+            updated_at  REAL NOT NULL,
+            lease_owner TEXT,
+            lease_until REAL NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated_at);
+        CREATE TABLE IF NOT EXISTS recall_docs (
+            session_id  TEXT NOT NULL,
+            seq         INTEGER NOT NULL,
+            kind        TEXT NOT NULL,
+            user_text   TEXT NOT NULL,
+            assistant_text TEXT NOT NULL,
+            PRIMARY KEY (session_id, seq)
+        );
+    """
+
+    def __init__(self, path: str, ttl_secs: float = 3600, lease_secs: float = 60,
+                 recall_cache: int = 1000):
+        super().__init__(path)
+        self.ttl_secs = ttl_secs
+        self.lease_secs = lease_secs
+        self.recall_cache = recall_cache
+        self._recall = OrderedDict()     # session_id -> RecallIndex built in this process
+        self._recall_lock = threading.Lock()
+        self._last_expire = 0.0
+        self._leases = {}                # lease owner -> session_id held by this process
+        self._lease_lock = threading.Lock()
+        self._renewer = None
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def _initial_state(session_id: str) -> str:
+        conv = ConversationManager()
+        conv.session_id = session_id
+        return json.dumps(conv.to_dict())
+
+    def create(self) -> str:
+        session_id = self.new_id()
+        self._conn().execute(
+            "INSERT INTO sessions (id, state, updated_at) VALUES (?, ?, ?)",
+            (session_id, self._initial_state(session_id), time.time()),
+        )
+        return session_id
+
+    def exists(self, session_id: str) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM sessions WHERE id = ? AND updated_at >= ?",
+            (session_id, time.time() - self.ttl_secs),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, session_id: str) -> bool:
+        conn = self._conn()
+        cur = conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        conn.execute("DELETE FROM recall_docs WHERE session_id = ?", (session_id,))
+        with self._recall_lock:
+            self._recall.pop(session_id, None)
+        return cur.rowcount > 0
+
+
+    """
+    Loads the session (created if missing), yields its ConversationManager
+    and saves it back on exit. Waits up to lease_secs for another worker's
+    turn on the same session to finish, else raises SessionBusy; also raised
+    (and nothing is saved) if the lease was lost during the turn.
+    """
+    @contextmanager
+    def session(self, session_id: str):
+        conn = self._conn()
+        owner = uuid.uuid4().hex
+        self._expire(conn)
+        conn.execute(
+            "INSERT OR IGNORE INTO sessions (id, state, updated_at) VALUES (?, ?, ?)",
+            (session_id, self._initial_state(session_id), time.time()),
+        )
+
+        deadline = time.monotonic() + self.lease_secs
+        while True:
+            now = time.time()
+            cur = conn.execute(
+                "UPDATE sessions SET lease_owner = ?, lease_until = ? "
+                "WHERE id = ? AND lease_until < ?",
+                (owner, now + self.lease_secs, session_id, now),
+            )
+            if cur.rowcount:
+                break
+            if time.monotonic() > deadline:
+                raise SessionBusy(f"session {session_id} is busy")
+            time.sleep(0.02)
+
+        self._hold_lease(owner, session_id)
+        saved = False
+        try:
+            (state,) = conn.execute(
+                "SELECT state FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            data = json.loads(state)
+            conv = ConversationManager.from_dict(data)
+            if "recall" in data:
+                start_seq = 0    # session saved before recall_docs existed: migrate it
+            else:
+                conv.recall = self._load_recall(conn, session_id, data.get("recall_seq", 0))
+                start_seq = conv.recall.next_seq
+            yield conv
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = conn.execute(
+                    "UPDATE sessions SET state = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                    (json.dumps(conv.to_dict(recall=False), ensure_ascii=False), time.time(),
+                     session_id, owner),
+                )
+                if not cur.rowcount:
+                    raise SessionBusy(f"session {session_id} lease was lost during the turn")
+                self._save_recall(conn, session_id, conv.recall, start_seq)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            saved = True
+            self._cache_recall(session_id, conv.recall)
+        finally:
+            with self._lease_lock:
+                self._leases.pop(owner, None)
+            if not saved:
+                #The cached index may hold exchanges that were never stored
+                with self._recall_lock:
+                    self._recall.pop(session_id, None)
+            conn.execute(
+                "UPDATE sessions SET lease_owner = NULL, lease_until = 0 "
+                "WHERE id = ? AND lease_owner = ?",
+                (session_id, owner),
+            )
+
+
+    def _hold_lease(self, owner: str, session_id: str):
+        with self._lease_lock:
+            self._leases[owner] = session_id
+            if self._renewer is None:
+                self._renewer = threading.Thread(target=self._renew_leases, daemon=True,
+                                                 name="session-leases")
+                self._renewer.start()
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(self.lease_secs / 3)
+            with self._lease_lock:
+                leases = list(self._leases.items())
+            if not leases:
+                continue
+            until = time.time() + self.lease_secs
+            try:
+                self._conn().executemany(
+                    "UPDATE sessions SET lease_until = ? WHERE id = ? AND lease_owner = ?",
+                    [(until, session_id, owner) for owner, session_id in leases],
+                )
+            except sqlite3.Error:
+                pass    # retried on the next round; the lease still has 2/3 left
+
+
+    """
+    The session's RecallIndex up to recall_seq: the one cached in this
+    process, topped up with the rows other workers stored since, or rebuilt
+    from the table when there is none (or it is ahead of the stored state).
+    """
+    def _load_recall(self, conn, session_id: str, recall_seq: int) -> RecallIndex:
+        with self._recall_lock:
+            index = self._recall.pop(session_id, None)
+        if index is None or index.next_seq > recall_seq:
+            index = RecallIndex()
+        if index.next_seq < recall_seq:
+            rows = conn.execute(
+                "SELECT seq, kind, user_text, assistant_text FROM recall_docs "
+                "WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session_id, index.next_seq, recall_seq),
+            )
+            for seq, kind, user_text, assistant_text in rows:
+                index.add(user_text, assistant_text, kind, seq)
+            index.advance(recall_seq)
+        return index
+
+    """
+    Stores the exchanges added during the turn and drops rows the index
+    has evicted (notes are never evicted).
+    """
+    def _save_recall(self, conn, session_id: str, index: RecallIndex, start_seq: int):
+        docs = index.docs_since(start_seq)
+        if docs:
+            conn.executemany(
+                "INSERT OR REPLACE INTO recall_docs "
+                "(session_id, seq, kind, user_text, assistant_text) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, *doc) for doc in docs],
+            )
+        if index.next_seq > index.max_docs:
+            conn.execute(
+                "DELETE FROM recall_docs WHERE session_id = ? AND seq < ? AND kind != 'note'",
+                (session_id, index.next_seq - index.max_docs),
+            )
+
+    def _cache_recall(self, session_id: str, index: RecallIndex):
+        with self._recall_lock:
+            self._recall[session_id] = index
+            while len(self._recall) > self.recall_cache:
+                self._recall.popitem(last=False)
+
+    def _expire(self, conn):
+        #Idle sessions are purged at most once a minute per process
+        now = time.time()
+        if now - self._last_expire < 60:
+            return
+        self._last_expire = now
+        conn.execute("DELETE FROM sessions WHERE updated_at < ? AND lease_until < ?",
+                     (now - self.ttl_secs, now))
+        conn.execute("DELETE FROM recall_docs WHERE session_id NOT IN (SELECT id FROM sessions)")
+
+    def __len__(self):
+        (count,) = self._conn().execute(
+            "SELECT COUNT(*) FROM sessions WHERE updated_at >= ?",
+            (time.time() - self.ttl_secs,),
+        ).fetchone()
+        return count
+
+
+class SQLiteMetricsCollector(_SQLiteBase):
+    """
+    File-backed metrics shared by every worker. Each worker upserts its own
+    row (one snapshot per worker) from a background thread every
+    interval_secs; aggregate() merges the live rows. A worker deletes its row
+    when it stops, and rows not refreshed for stale_factor intervals (a
+    crashed or killed worker) are ignored and purged.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS worker_metrics (
+            worker_id  TEXT PRIMARY KEY,
+            snapshot   TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, source, worker_id: str = None, interval_secs: float = 5.0,
+                 stale_factor: float = 3.0):
+        super().__init__(path)
+        self.source = source    # callable returning a snapshot dict (LLMClient.snapshot)
+        self.worker_id = worker_id or f"{os.getpid()}"
+        self.interval_secs = interval_secs
+        self.stale_secs = interval_secs * stale_factor
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self):
+        snapshot = self.source()
+        if not snapshot:
+            return
+        self._conn().execute(
+            "INSERT INTO worker_metrics (worker_id, snapshot, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(worker_id) DO UPDATE SET snapshot = excluded.snapshot, "
+            "updated_at = excluded.updated_at",
+            (self.worker_id, json.dumps(snapshot), time.time()),
+        )
+
+    def start(self):
+        if self._thread is None:
+            #A previous process with this PID, or workers that died without stop()
+            self._conn().execute(
+                "DELETE FROM worker_metrics WHERE worker_id = ? OR updated_at < ?",
+                (self.worker_id, time.time() - self.stale_secs),
+            )
+            self._thread = threading.Thread(target=self._run, name="metrics-publisher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._conn().execute("DELETE FROM worker_metrics WHERE worker_id = ?", (self.worker_id,))
+
+    def _run(self):
+        while not self._stop.wait(self.interval_secs):
+            try:
+                self.publish()
+            except sqlite3.Error:
+                pass
+
+
+    """
+    Totals across live workers (rows refreshed within stale_secs): numeric
+    counters are summed, list values are concatenated, and "latencies" is
+    summarized into avg/p50/p95.
+    """
+    def aggregate(self) -> dict:
+        rows = self._conn().execute(
+            "SELECT snapshot FROM worker_metrics WHERE updated_at >= ?",
+            (time.time() - self.stale_secs,),
+        ).fetchall()
+        totals = {}
+        for (raw,) in rows:
+            for key, value in json.loads(raw).items():
+                if isinstance(value, list):
+                    totals.setdefault(key, []).extend(value)
+                elif isinstance(value, (int, float)):
+                    totals[key] = totals.get(key, 0) + value
+        latencies = totals.pop("latencies", [])
+        totals.update(summarize_latencies(latencies))
+        totals["workers"] = len(rows)
+        return totals
+
+
+class SQLiteNotesStore(_SQLiteBase):
+    """
+    Notes and reminders per owner. Rows are written in batches, one
+    transaction per batch, so a bulk import pays one commit per chunk
+    instead of one per entry.
+    Scope: this is the bulk import target only. /vernota and /agenda still
+    answer from the conversation history, and sessions carry no owner, so
+    imported rows are not visible in the chat yet.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS notes (
+            id         INTEGER PRIMARY KEY,
+            owner      TEXT NOT NULL,
+            text       TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            source     TEXT
+        );
+        CREATE INDEX IF NOT EXISTS notes_owner ON notes(owner);
+        CREATE TABLE IF NOT EXISTS reminders (
+            id         INTEGER PRIMARY KEY,
+            owner      TEXT NOT NULL,
+            text       TEXT NOT NULL,
+            due_date   TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            source     TEXT
+        );
+        CREATE INDEX IF NOT EXISTS reminders_owner_due ON reminders(owner, due_date);
+    """
+
+
+    """
+    Inserts one batch in a single transaction (all rows or none).
+    notes: [(owner, text, source)], reminders: [(owner, text, due_date, source)]
+    with due_date as an ISO "YYYY-MM-DD" string.
+    """
+    def insert_many(self, notes=(), reminders=()):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO notes (owner, text, created_at, source) VALUES (?, ?, ?, ?)",
+                ((owner, text, now, source) for owner, text, source in notes),
+            )
+            conn.executemany(
+                "INSERT INTO reminders (owner, text, due_date, created_at, source) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((owner, text, due, now, source) for owner, text, due, source in reminders),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def count(self, owner: str = None) -> dict:
+        conn = self._conn()
+        where, args = ("WHERE owner = ?", (owner,)) if owner is not None else ("", ())
+        (notes,) = conn.execute(f"SELECT COUNT(*) FROM notes {where}", args).fetchone()
+        (reminders,) = conn.execute(f"SELECT COUNT(*) FROM reminders {where}", args).fetchone()
+        return {"notes": notes, "reminders": reminders}
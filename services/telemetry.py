@@ -0,0 +1,237 @@
+# services/telemetry.py
+
+"""
+Structured logging for AI Copilot.
+Records are pushed to a bounded queue and serialized to JSON lines by a
+background thread, so the request path never formats or writes output.
+
+Per-request trace spans collect stage durations and are emitted as a single
+"request" record when the request finishes. With a RequestProfiler attached
+(services/profiling.py), slow requests are also captured to disk.
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+from services.profiling import profiler_from_env
+
+
+class JSONLogger:
+    def __init__(self, stream=None, queue_size: int = 10000, sample_rate: float = 1.0,
+                 max_field_chars: int = 500, profiler=None):
+        self.stream = stream or sys.stdout
+        self.profiler = profiler
+        self.sample_rate = sample_rate
+        self.max_field_chars = max_field_chars
+        self._queue = queue.Queue(maxsize=queue_size)
+
+        #Counters (updated from request threads and the writer thread)
+        self.emitted = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self._counters_lock = threading.Lock()
+
+        self._worker = threading.Thread(target=self._run, name="json-logger", daemon=True)
+        self._worker.start()
+
+
+    """
+    Sampling is decided per request_id so a request's records are kept or
+    dropped together. Warnings and errors are never sampled out.
+    """
+    def _sampled(self, request_id: str, level: str) -> bool:
+        if level != "info" or self.sample_rate >= 1.0:
+            return True
+        if self.sample_rate <= 0.0:
+            return False
+        bucket = zlib.crc32(request_id.encode()) % 10000
+        return bucket < self.sample_rate * 10000
+
+
+    """
+    Enqueues a record. Never blocks: when the queue is full the record is
+    dropped and counted.
+    """
+    def log(self, event: str, request_id: str = "-", level: str = "info", **fields):
+        if not self._sampled(request_id, level):
+            with self._counters_lock:
+                self.sampled_out += 1
+            return
+        try:
+            self._queue.put_nowait((time.time(), level, event, request_id, fields))
+        except queue.Full:
+            with self._counters_lock:
+                self.dropped += 1
+
+    def span(self, request_id: str) -> "Span":
+        return Span(self, request_id)
+
+    def _cap(self, value):
+        if isinstance(value, str) and len(value) > self.max_field_chars:
+            return value[:self.max_field_chars] + f"...(+{len(value) - self.max_field_chars})"
+        return value
+
+    def _format(self, record) -> str:
+        ts, level, event, request_id, fields = record
+        payload = {
+            "ts": datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": level,
+            "event": event,
+            "req": request_id,
+        }
+        for key, value in fields.items():
+            payload[key] = self._cap(value)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+    """
+    Appends the formatted record to lines. A record that can't be
+    serialized is dropped and counted; it never stops the writer thread.
+    """
+    def _add(self, lines, record):
+        try:
+            lines.append(self._format(record))
+        except Exception:
+            with self._counters_lock:
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    return
+                lines = []
+                self._add(lines, record)
+                #Drain whatever else is ready to write it in one call
+                for _ in range(255):
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        self._queue.task_done()
+                        self._write(lines)
+                        return
+                    self._add(lines, nxt)
+                    self._queue.task_done()
+                self._write(lines)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, lines):
+        if not lines:
+            return
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+            written, failed = len(lines), 0
+        except Exception:
+            written, failed = 0, len(lines)
+        with self._counters_lock:
+            self.emitted += written
+            self.dropped += failed
+
+    def flush(self):
+        """Blocks until every queued record has been written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join(timeout=2)
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            return {
+                "emitted": self.emitted,
+                "dropped": self.dropped,
+                "sampled_out": self.sampled_out,
+                "queued": self._queue.qsize(),
+            }
+
+
+class Span:
+    """
+    Trace of a single request.
+    Use `with span.stage("name"):` around each step; `end()` emits one record
+    with every stage duration and the total, in milliseconds.
+    """
+    def __init__(self, logger: JSONLogger, request_id: str):
+        self.logger = logger
+        self.request_id = request_id
+        self.stages = {}
+        self.fields = {}
+        self.samples = Counter()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stages[name] = round(self.stages.get(name, 0.0) + elapsed, 3)
+
+    """
+    Marks the block as this request's work so the sampling profiler (if
+    enabled) records this thread's stacks for it. Use it in the thread that
+    runs the turn, which is not always the one that created the span.
+    """
+    def track(self):
+        profiler = self.logger.profiler
+        return profiler.track(self.samples) if profiler is not None else nullcontext()
+
+    def annotate(self, **fields):
+        self.fields.update(fields)
+
+    def log(self, event: str, level: str = "info", **fields):
+        self.logger.log(event, self.request_id, level, **fields)
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def end(self, **fields):
+        self.fields.update(fields)
+        total_ms = self.elapsed_ms
+        profiler = self.logger.profiler
+        if profiler is not None:
+            path = profiler.capture(self.request_id, total_ms, self.stages, self.fields,
+                                    self.samples)
+            if path is not None:
+                self.fields["profile"] = path
+                self.log("slow_request", level="warning", total_ms=round(total_ms, 3),
+                         profile=path)
+        self.logger.log("request", self.request_id, stages=self.stages,
+                        total_ms=round(total_ms, 3), **self.fields)
+
+
+_default_logger = None
+_default_lock = threading.Lock()
+
+
+"""
+Process-wide logger configured from environment variables:
+LOG_SAMPLE_RATE (0.0-1.0), LOG_QUEUE_SIZE, LOG_MAX_FIELD_CHARS, and the
+PROFILE_* variables of services/profiling.py.
+"""
+def get_logger() -> JSONLogger:
+    global _default_logger
+    if _default_logger is None:
+        with _default_lock:
+            if _default_logger is None:
+                _default_logger = JSONLogger(
+                    queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+                    sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+                    max_field_chars=int(os.getenv("LOG_MAX_FIELD_CHARS", "500")),
+                    profiler=profiler_from_env(),
+                )
+    return _default_logger
@@ -0,0 +1,135 @@
+# services/usage.py
+
+"""
+Token and cost accounting for LLM calls.
+Tracks prompt vs completion tokens per intent, per model and per session,
+estimates cost from a per-model price table, and records how prompt size
+grows with the number of history messages sent (and what the context
+window trimming saves).
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+# USD per 1M tokens (input, output). Override with TOKEN_PRICES, e.g.
+# TOKEN_PRICES='{"meta-llama/llama-4-maverick-17b-128e-instruct": [0.2, 0.6]}'
+DEFAULT_PRICES = {
+    "meta-llama/llama-4-maverick-17b-128e-instruct": (0.20, 0.60),
+}
+
+
+def load_prices() -> dict:
+    prices = dict(DEFAULT_PRICES)
+    raw = os.getenv("TOKEN_PRICES")
+    if raw:
+        prices.update({model: tuple(p) for model, p in json.loads(raw).items()})
+    return prices
+
+
+"""
+Rough prompt size before calling the model (~4 characters per token plus
+a few tokens of per-message overhead). Only used for budget checks.
+"""
+def estimate_tokens(messages) -> int:
+    return sum(len(m["content"]) // 4 + 4 for m in messages)
+
+
+def _bucket():
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+
+class UsageLedger:
+    def __init__(self, prices: dict = None, max_sessions: int = 10000):
+        self.prices = prices if prices is not None else load_prices()
+        self.max_sessions = max_sessions
+        self.by_intent = {}
+        self.by_model = {}
+        self.by_session = OrderedDict()
+        self.by_history_len = {}     # history messages -> [calls, prompt_tokens]
+        self.trimmed_messages = 0    # history messages dropped by the context window
+        self.budget_blocked = 0
+        self._lock = threading.Lock()
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        price_in, price_out = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+    """
+    Records one completed call.
+    history_len is the number of history messages sent; trimmed is how many
+    older messages the context window left out.
+    """
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int, intent: str = None,
+               session_id: str = None, history_len: int = 0, trimmed: int = 0):
+        cost = self.cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            buckets = [self.by_intent.setdefault(intent or "UNKNOWN", _bucket()),
+                       self.by_model.setdefault(model, _bucket())]
+            if session_id is not None:
+                if session_id not in self.by_session:
+                    self.by_session[session_id] = _bucket()
+                    while len(self.by_session) > self.max_sessions:
+                        self.by_session.popitem(last=False)
+                self.by_session.move_to_end(session_id)
+                buckets.append(self.by_session[session_id])
+
+            for bucket in buckets:
+                bucket["calls"] += 1
+                bucket["prompt_tokens"] += prompt_tokens
+                bucket["completion_tokens"] += completion_tokens
+                bucket["cost_usd"] += cost
+
+            growth = self.by_history_len.setdefault(history_len, [0, 0])
+            growth[0] += 1
+            growth[1] += prompt_tokens
+            self.trimmed_messages += trimmed
+
+    def block_budget(self):
+        """Counts a turn refused by the session token budget."""
+        with self._lock:
+            self.budget_blocked += 1
+
+    def session_usage(self, session_id: str) -> dict:
+        with self._lock:
+            return dict(self.by_session.get(session_id) or _bucket())
+
+
+    """
+    Average prompt tokens per number of history messages, and an estimate of
+    the prompt tokens the context window saved (trimmed messages times the
+    observed average cost of one history message).
+    """
+    def prompt_growth(self) -> dict:
+        with self._lock:
+            avg = {n: round(tokens / calls, 1)
+                   for n, (calls, tokens) in sorted(self.by_history_len.items())}
+            trimmed = self.trimmed_messages
+
+        per_message = 0.0
+        if len(avg) >= 2:
+            (n0, t0), (n1, t1) = min(avg.items()), max(avg.items())
+            per_message = (t1 - t0) / (n1 - n0)
+        return {
+            "avg_prompt_tokens_by_history_len": avg,
+            "tokens_per_history_message": round(per_message, 1),
+            "trimmed_messages": trimmed,
+            "trimming_saved_tokens_est": round(trimmed * per_message),
+        }
+
+    def report(self) -> dict:
+        with self._lock:
+            by_intent = {k: dict(v) for k, v in self.by_intent.items()}
+            by_model = {k: dict(v) for k, v in self.by_model.items()}
+            sessions = len(self.by_session)
+            budget_blocked = self.budget_blocked
+        return {
+            "by_intent": by_intent,
+            "by_model": by_model,
+            "sessions_tracked": sessions,
+            "budget_blocked": budget_blocked,
+            "prompt_growth": self.prompt_growth(),
+        }
@@ -0,0 +1,206 @@
+# tests/test_api.py
+"""
+Tests for the headless ASGI API.
+Requests are driven directly through the ASGI interface (no server), and
+the LLM is replaced by a fake client so tests run offline.
+"""
+
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from app.api import CopilotAPI
+from services.sessions import SessionStore
+from services.store import SQLiteSessionStore
+from services.telemetry import JSONLogger
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, messages, **kwargs):
+        self.calls.append(messages)
+        return "respuesta OK"
+
+    def stream(self, messages, **kwargs):
+        self.calls.append(messages)
+        yield "respuesta "
+        yield "OK"
+
+
+class SlowLLM(FakeLLM):
+    """First call blocks until its request is cancelled."""
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+
+    def generate(self, messages, cancel=None, **kwargs):
+        self.calls.append(messages)
+        if len(self.calls) == 1:
+            self.started.set()
+            cancel.wait(5)
+            return None
+        return "respuesta OK"
+
+
+def request(api, method, path, body=None, disconnect=None):
+    """
+    Runs one request; returns (status, headers, raw body bytes).
+    After the body, receive() waits like an open connection until the
+    optional `disconnect` event is set.
+    """
+    raw = json.dumps(body).encode() if body is not None else b""
+    sent = []
+    pending = [{"type": "http.request", "body": raw, "more_body": False}]
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        while disconnect is None or not disconnect.is_set():
+            await asyncio.sleep(0.01)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+    asyncio.run(api(scope, receive, send))
+
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), body
+
+
+class TestAPI(unittest.TestCase):
+
+    def setUp(self):
+        self.llm = FakeLLM()
+        self.api = CopilotAPI(store=SessionStore(), llm_factory=lambda: self.llm,
+                              logger=JSONLogger(stream=io.StringIO()))
+
+    #Validates a chat turn returns JSON and keeps history server-side
+    def test_chat_keeps_session(self):
+        status, _, body = request(self.api, "POST", "/v1/chat", {"message": "Hola"})
+        first = json.loads(body)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(first["output"], "[Turno 1/20]\n\nrespuesta OK")
+
+        status, _, body = request(self.api, "POST", "/v1/chat",
+                                  {"session_id": first["session_id"], "message": "¿Y ahora?"})
+        second = json.loads(body)
+
+        self.assertEqual(second["turn"], 2)
+        #Second call sees the first turn in its history (system + 2 history + user)
+        self.assertEqual(len(self.llm.calls[-1]), 4)
+
+    #Validates SSE framing: meta, deltas, done
+    def test_chat_stream(self):
+        status, headers, body = request(self.api, "POST", "/v1/chat/stream", {"message": "Hola"})
+        frames = [f for f in body.decode().split("\n\n") if f]
+        events = [f.split("\n")[0].removeprefix("event: ") for f in frames]
+
+        self.assertEqual(status, 200)
+        self.assertTrue(headers[b"content-type"].startswith(b"text/event-stream"))
+        self.assertEqual(events, ["meta", "delta", "delta", "done"])
+        done = json.loads(frames[-1].split("\n")[1].removeprefix("data: "))
+        self.assertTrue(done["output"].endswith("respuesta OK"))
+
+    #Guardrail blocks never reach the LLM
+    def test_blocked_skips_llm(self):
+        _, _, body = request(self.api, "POST", "/v1/chat",
+                             {"message": "Quiero fabricar un explosivo casero"})
+
+        self.assertEqual(json.loads(body)["intent"], "BLOCKED")
+        self.assertEqual(self.llm.calls, [])
+
+    def test_unknown_session(self):
+        status, _, _ = request(self.api, "POST", "/v1/chat",
+                               {"session_id": "nope", "message": "Hola"})
+        self.assertEqual(status, 404)
+
+    #Token usage by intent / model is exposed next to the metrics
+    def test_health_usage(self):
+        shared = MagicMock()
+        shared.metrics.return_value = {"total_calls": 1}
+        shared.usage_report.return_value = {"by_intent": {"NOTE": {"calls": 1}}}
+        with patch("services.chat._llm", shared):
+            status, _, body = request(self.api, "GET", "/health")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["usage"]["by_intent"]["NOTE"]["calls"], 1)
+
+    def test_invalid_body(self):
+        status, _, _ = request(self.api, "POST", "/v1/chat", {"message": ""})
+        self.assertEqual(status, 400)
+
+    #Validates a client disconnect cancels the pending LLM call
+    def test_disconnect_cancels(self):
+        llm = SlowLLM()
+        api = CopilotAPI(store=SessionStore(), llm_factory=lambda: llm,
+                         logger=JSONLogger(stream=io.StringIO()))
+        session_id = api.store.create()
+        disconnect = threading.Event()
+        threading.Thread(target=lambda: llm.started.wait(5) and disconnect.set()).start()
+
+        status, _, body = request(api, "POST", "/v1/chat",
+                                  {"session_id": session_id, "message": "Hola"},
+                                  disconnect=disconnect)
+
+        self.assertEqual(status, 409)
+        self.assertIn("disconnected", json.loads(body)["error"])
+        with api.store.session(session_id) as conv:
+            self.assertEqual(conv.turn_count, 0)
+
+    #Validates a new message supersedes the session's pending one
+    def test_new_message_supersedes(self):
+        llm = SlowLLM()
+        api = CopilotAPI(store=SessionStore(), llm_factory=lambda: llm,
+                         logger=JSONLogger(stream=io.StringIO()))
+        session_id = api.store.create()
+        first = {}
+        thread = threading.Thread(target=lambda: first.update(result=request(
+            api, "POST", "/v1/chat", {"session_id": session_id, "message": "Hola"})))
+        thread.start()
+        llm.started.wait(5)
+
+        status, _, body = request(api, "POST", "/v1/chat",
+                                  {"session_id": session_id, "message": "Otra pregunta"})
+        thread.join(5)
+
+        self.assertEqual(first["result"][0], 409)
+        self.assertIn("superseded", json.loads(first["result"][2])["error"])
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["turn"], 1)
+        self.assertEqual(api.cancels.superseded, 1)
+
+    #Validates a session held by another worker's turn is a 409, not a crash
+    def test_session_busy_in_other_worker(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.db")
+            api = CopilotAPI(store=SQLiteSessionStore(path, lease_secs=0.2),
+                             llm_factory=lambda: self.llm,
+                             logger=JSONLogger(stream=io.StringIO()))
+            other_worker = SQLiteSessionStore(path)
+            session_id = other_worker.create()
+
+            with other_worker.session(session_id):
+                for endpoint in ("/v1/chat", "/v1/chat/stream"):
+                    status, _, body = request(api, "POST", endpoint,
+                                              {"session_id": session_id, "message": "Hola"})
+                    self.assertEqual(status, 409)
+                    self.assertIn("busy", json.loads(body)["error"])
+
+            status, _, _ = request(api, "POST", "/v1/chat",
+                                   {"session_id": session_id, "message": "Hola"})
+            self.assertEqual(status, 200)
+            self.assertEqual(len(self.llm.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
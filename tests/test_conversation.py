@@ -41,6 +41,11 @@ class TestConversation(unittest.TestCase):
         self.assertEqual(intent, "SUGGESTION")
         self.assertIn("nota", suggestion.lower())
     
+    #Ordinary chat that mentions "escribe" must not trigger a note suggestion
+    def test_no_suggestion_for_chat(self):
+        cm = ConversationManager()
+        self.assertIsNone(cm.intent_suggestion("escribe un poema sobre el mar"))
+
     #Validates BLOCK when faced with potentially dangerous content
     def test_blocked_input(self):
         cm = ConversationManager()
@@ -61,6 +66,44 @@ class TestConversation(unittest.TestCase):
         self.assertEqual(history, [])
         self.assertIn("reiniciado", output.lower())
 
+    #Validates the session survives a round trip through its JSON form
+    def test_serialization_roundtrip(self):
+        cm = ConversationManager()
+        cm.update_state("hola", "¡hola!")
+
+        restored = ConversationManager.from_dict(cm.to_dict())
+
+        self.assertEqual(restored.turn_count, 1)
+        self.assertEqual(list(restored.history), list(cm.history))
+
+    #Validates the transcript window returns the latest messages only
+    def test_transcript_window(self):
+        cm = ConversationManager()
+        for i in range(5):
+            cm.record_transcript(f"u{i}", f"a{i}")
+
+        window, has_older = cm.transcript_window(4)
+        self.assertEqual([t.content for t in window], ["u3", "a3", "u4", "a4"])
+        self.assertTrue(has_older)
+        self.assertFalse(cm.transcript_window(10)[1])
+
+        restored = ConversationManager.from_dict(cm.to_dict())
+        self.assertEqual(list(restored.transcript), list(cm.transcript))
+
+    #Validates evicted transcript messages still count as older ones
+    def test_transcript_window_after_wrap(self):
+        cm = ConversationManager()
+        for i in range(cm.max_transcript // 2 + 1):
+            cm.record_transcript(f"u{i}", f"a{i}")
+
+        self.assertEqual(cm.transcript_dropped, 2)
+        window, has_older = cm.transcript_window(cm.max_transcript)
+        self.assertEqual(window[0].content, "u1")
+        self.assertTrue(has_older)
+
+        restored = ConversationManager.from_dict(cm.to_dict())
+        self.assertTrue(restored.transcript_window(cm.max_transcript)[1])
+
 
 if __name__ == "__main__":
     unittest.main()
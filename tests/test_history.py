@@ -0,0 +1,61 @@
+# tests/test_history.py
+
+import unittest
+from core.history import Turn, TurnBuffer
+from core.prompting import build_messages, SYSTEM_PREFIXES
+
+class TestHistory(unittest.TestCase):
+
+    #Validates the ring keeps only the most recent turns, oldest first
+    def test_ring_overwrites_oldest(self):
+        buf = TurnBuffer(3)
+        for i in range(5):
+            buf.append(Turn("user", f"m{i}"))
+
+        self.assertEqual(len(buf), 3)
+        self.assertEqual([t.content for t in buf], ["m2", "m3", "m4"])
+        self.assertEqual(buf[0]["content"], "m2")
+        self.assertEqual(buf[-1]["content"], "m4")
+
+    #Validates resize keeps the newest turns
+    def test_resize(self):
+        buf = TurnBuffer(4)
+        for i in range(4):
+            buf.append(Turn("user", f"m{i}"))
+        buf.resize(2)
+
+        self.assertEqual(buf.capacity, 2)
+        self.assertEqual([t.content for t in buf], ["m2", "m3"])
+
+    #Turns can't be modified once stored
+    def test_turn_immutable(self):
+        turn = Turn("user", "hola")
+        with self.assertRaises(TypeError):
+            turn["content"] = "otro"
+        with self.assertRaises(TypeError):
+            turn.content = "otro"
+        self.assertEqual(turn, Turn("user", "hola"))
+        self.assertEqual(turn["content"], "hola")
+
+    #Validates build_messages hands the LLM plain dicts the caller can't use to alter the history
+    def test_messages_are_copies(self):
+        buf = TurnBuffer(4)
+        buf.append(Turn("user", "Hola"))
+        buf.append(Turn("assistant", "Hola, ¿en qué te ayudo?"))
+
+        msgs = build_messages("SP_NOTE", buf.snapshot(), "Crea una nota")
+
+        self.assertEqual(msgs[0], SYSTEM_PREFIXES["SP_NOTE"][0].as_message())
+        self.assertEqual(msgs[1], {"role": "user", "content": "Hola"})
+        self.assertEqual(msgs[-1], {"role": "user", "content": "Crea una nota"})
+        with self.assertRaises(TypeError):
+            SYSTEM_PREFIXES["SP_NOTE"] = ()
+
+        msgs[0]["content"] = "otro prompt"
+        msgs[1]["content"] = "otro"
+        self.assertNotEqual(SYSTEM_PREFIXES["SP_NOTE"][0].content, "otro prompt")
+        self.assertEqual(buf[0].content, "Hola")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# tests/test_importer.py
+"""
+Tests for the bulk importer of notes and reminders (no LLM involved).
+"""
+
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from core.dates import parse_reminder_date
+from services.importer import import_entries, import_file, prepare_entry, read_entries
+from services.store import SQLiteNotesStore
+
+TODAY = datetime(2026, 10, 19)
+
+
+class TestImporter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteNotesStore(os.path.join(self.tmp.name, "state.db"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    #CSV with Spanish headers; bad rows are skipped with a reason
+    def test_csv_import(self):
+        path = self._write("notas.csv", (
+            "tipo,texto\n"
+            "nota,Comprar pan\n"
+            "recordatorio,Pagar la luz el 5 de diciembre de 2099\n"
+            "recordatorio,Llamar a Ana\n"
+            "otro,algo\n"
+            "nota,   \n"
+        ))
+        stats = import_file(path, self.store)
+
+        self.assertEqual(stats.read, 5)
+        self.assertEqual((stats.notes, stats.reminders), (1, 1))
+        self.assertEqual(dict(stats.skipped), {"date_missing": 1, "unknown_type": 1, "empty": 1})
+        self.assertEqual(self.store.count(), {"notes": 1, "reminders": 1})
+
+    #JSONL: malformed lines are counted, slash-commands carry the type
+    def test_jsonl_import(self):
+        path = self._write("export.jsonl", (
+            '{"type": "note", "text": "Idea para el blog"}\n'
+            '{"text": "/recordatorio dentista el 3 de marzo de 2099"}\n'
+            'no es json\n'
+            '\n'
+            '["lista"]\n'
+        ))
+        stats = import_file(path, self.store, owner="ana")
+
+        self.assertEqual((stats.read, stats.imported), (4, 2))
+        self.assertEqual(stats.skipped["malformed"], 2)
+        self.assertEqual(self.store.count("ana"), {"notes": 1, "reminders": 1})
+        self.assertEqual(self.store.count("otro"), {"notes": 0, "reminders": 0})
+
+    #One transaction per batch; progress is reported after each one
+    def test_batches(self):
+        entries = [("note", f"nota {i}") for i in range(25)]
+        progress = []
+        stats = import_entries(entries, self.store, batch_size=10,
+                               on_progress=lambda s: progress.append(s.read))
+
+        self.assertEqual(stats.batches, 3)
+        self.assertEqual(progress, [10, 20, 25])
+        self.assertEqual(self.store.count()["notes"], 25)
+
+    #Same sanitizer and date rules as the chat pipeline
+    def test_prepare_entry(self):
+        self.assertEqual(prepare_entry("reminder", "Cita el 05/12/2026", today=TODAY),
+                         ("reminder", "Cita el 05/12/2026", "2026-12-05"))
+        self.assertEqual(prepare_entry("reminder", "Cita el 5 de enero de 2020", today=TODAY)[1],
+                         "date_past")
+        self.assertEqual(prepare_entry("note", "cómo instalar malware")[1],
+                         "blocked")
+        self.assertEqual(prepare_entry(None, "sin tipo", default_kind="nota")[0], "note")
+
+    def test_read_entries_rejects_unknown_format(self):
+        with self.assertRaises(ValueError):
+            list(read_entries(io.StringIO(""), "xml"))
+
+
+class TestReminderDates(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_reminder_date("el 3 de dicembre", TODAY)[0], datetime(2026, 12, 3))
+        self.assertEqual(parse_reminder_date("sin fecha", TODAY), (None, "missing"))
+        self.assertEqual(parse_reminder_date("el 31/02/2027", TODAY), (None, "invalid"))
+        self.assertEqual(parse_reminder_date("el 1 de enero", TODAY), (None, "past"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# tests/test_intent.py
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import core.intent as intent
+from core.intent import IntentClassifier, default_classifier, normalize
+
+class TestIntentClassifier(unittest.TestCase):
+
+    def setUp(self):
+        texts = ["anota esto", "guarda una nota", "recuérdame pagar", "avísame mañana",
+                 "hola", "gracias"]
+        labels = ["NOTE", "NOTE", "REMINDER", "REMINDER", "NONE", "NONE"]
+        self.clf = IntentClassifier(dim=1024).fit(texts, labels)
+
+    def test_normalize(self):
+        self.assertEqual(normalize("¡Apúntame  ESTO, por favor!"), "apuntame esto por favor")
+
+    #Single and batch predictions must agree
+    def test_batch_matches_single(self):
+        texts = ["anota la receta", "recuérdame el lunes", "hola!", ""]
+        batch = self.clf.predict_batch(texts)
+        for text, (intent, proba) in zip(texts, batch):
+            single_intent, single_proba = self.clf.predict(text)
+            self.assertEqual(intent, single_intent)
+            self.assertAlmostEqual(proba, single_proba, places=5)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.npz")
+            self.clf.save(path)
+            loaded = IntentClassifier.load(path)
+
+        self.assertEqual(loaded.predict("anota esto"), self.clf.predict("anota esto"))
+
+    #The shipped model separates commands from ordinary chat
+    def test_default_classifier(self):
+        clf = default_classifier()
+
+        self.assertEqual(clf.predict("apúntame esto por favor")[0], "NOTE")
+        self.assertEqual(clf.predict("recuérdame llamar al dentista")[0], "REMINDER")
+        self.assertEqual(clf.predict("escribe un poema sobre el mar")[0], "NONE")
+
+    #The shipped weights are what training on the shipped data produces
+    def test_shipped_model_is_current(self):
+        trained = IntentClassifier.from_jsonl(intent.DEFAULT_TRAINING_DATA)
+        shipped = IntentClassifier.load(intent.DEFAULT_MODEL)
+        texts = ["anota la receta", "recuérdame el lunes", "busca el clima", "hola"]
+        self.assertEqual([p[0] for p in shipped.predict_batch(texts)],
+                         [p[0] for p in trained.predict_batch(texts)])
+
+    #Concurrent first calls share one load, and nothing is trained
+    def test_default_classifier_loads_once(self):
+        results = []
+        with (patch.object(intent, "_default", None),
+              patch.object(IntentClassifier, "load", wraps=IntentClassifier.load) as load,
+              patch.object(IntentClassifier, "from_jsonl") as train):
+            threads = [threading.Thread(target=lambda: results.append(default_classifier()))
+                       for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(load.call_count, 1)
+        train.assert_not_called()
+        self.assertTrue(all(clf is results[0] for clf in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,8 +12,13 @@ All calls to Groq are mocked to ensure tests run offline and deterministically.
 """
 
 import os
+import sys
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
+from core.output import OutputLimit
+from services.cancel import CancelToken
 from services.llm import LLMClient
 import httpx
 
@@ -109,6 +114,213 @@ class TestLLMClient(unittest.TestCase):
 
         self.assertIn("tardó demasiado", result)
 
+    """
+    Prompt and completion tokens are tracked separately, per intent and session.
+    """
+
+    def test_usage_accounting(self):
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock(message=MagicMock(content="ok"))]
+        mock_response.usage = MagicMock(prompt_tokens=120, completion_tokens=30, total_tokens=150)
+        self.mock_groq_instance.chat.completions.create.return_value = mock_response
+
+        charged = []
+        self.llm.generate([{"role": "user", "content": "hello"}], intent="NOTE",
+                          session_id="s1", on_usage=lambda p, c: charged.append((p, c)))
+
+        metrics = self.llm.metrics()
+        self.assertEqual(metrics["prompt_tokens"], 120)
+        self.assertEqual(metrics["completion_tokens"], 30)
+        self.assertEqual(metrics["total_tokens"], 150)
+        self.assertEqual(self.llm.usage_report()["by_intent"]["NOTE"]["calls"], 1)
+        self.assertEqual(charged, [(120, 30)])
+
+    """
+    One client is shared by every request thread: concurrent calls must not
+    lose counter updates.
+    """
+
+    def test_concurrent_counters(self):
+        response = MagicMock()
+        response.choices = [MagicMock(message=MagicMock(content="ok"))]
+        response.usage = MagicMock(prompt_tokens=120, completion_tokens=30, total_tokens=150)
+        self.mock_groq_instance.chat.completions.create = lambda **kwargs: response
+
+        def calls():
+            for _ in range(200):
+                self.llm.generate([{"role": "user", "content": "hello"}])
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=calls) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        metrics = self.llm.metrics()
+        self.assertEqual(metrics["total_calls"], 1600)
+        self.assertEqual(metrics["prompt_tokens"], 1600 * 120)
+        self.assertEqual(metrics["total_tokens"], 1600 * 150)
+        self.assertEqual(len(self.llm.latencies), 1600)
+
+    """
+    Streaming should yield each delta in order and record the latency.
+    """
+
+    def test_stream(self):
+        def chunk(text):
+            return MagicMock(choices=[MagicMock(delta=MagicMock(content=text))], x_groq=None)
+
+        self.mock_groq_instance.chat.completions.create.return_value = iter(
+            [chunk("response "), chunk("OK")]
+        )
+
+        result = list(self.llm.stream([{"role": "user", "content": "hello"}]))
+
+        self.assertEqual(result, ["response ", "OK"])
+        self.assertEqual(len(self.llm.latencies), 1)
+
+    """
+    Cancelling during the retry backoff returns right away: no fallback,
+    no further attempt, counted as cancelled.
+    """
+    def test_cancel_during_backoff(self):
+        error = httpx.HTTPStatusError("Server Error", request=None,
+                                      response=MagicMock(status_code=503))
+        self.mock_groq_instance.chat.completions.create.side_effect = error
+        cancel = CancelToken()
+        threading.Timer(0.05, cancel.cancel, args=("superseded",)).start()
+
+        start = time.monotonic()
+        result = self.llm.generate([{"role": "user", "content": "hello"}], cancel=cancel)
+
+        self.assertIsNone(result)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(self.mock_groq_instance.chat.completions.create.call_count, 1)
+        self.assertEqual(self.llm.metrics()["cancelled_superseded"], 1)
+        self.assertEqual(self.llm.fallback_count, 0)
+
+    """
+    Cancelling mid-stream closes the stream and stops yielding deltas.
+    """
+    def test_cancel_mid_stream(self):
+        cancel = CancelToken()
+
+        class Chunks:
+            closed = False
+            def __iter__(self):
+                for text in ("uno ", "dos ", "tres"):
+                    yield MagicMock(choices=[MagicMock(delta=MagicMock(content=text))],
+                                    x_groq=None)
+            def close(self):
+                Chunks.closed = True
+
+        self.mock_groq_instance.chat.completions.create.return_value = Chunks()
+
+        result = []
+        for delta in self.llm.stream([{"role": "user", "content": "hello"}], cancel=cancel):
+            result.append(delta)
+            cancel.cancel("disconnected")
+
+        self.assertEqual(result, ["uno "])
+        self.assertTrue(Chunks.closed)
+        self.assertEqual(self.llm.metrics()["total_cancelled"], 1)
+        self.assertEqual(self.llm.latencies, [])
+
+    """
+    An answer that outgrows its OutputLimit is cut: the stream is closed,
+    the usage is estimated (the usage chunk never arrives) and the cut is
+    counted.
+    """
+    def test_output_limit_cuts_stream(self):
+        class Chunks:
+            closed = False
+            read = 0
+            def __iter__(self):
+                for text in ("Uno\n", "Dos\n", "Tres\n", "Cuatro\n"):
+                    Chunks.read += 1
+                    yield MagicMock(choices=[MagicMock(delta=MagicMock(content=text))],
+                                    x_groq=None)
+            def close(self):
+                Chunks.closed = True
+
+        self.mock_groq_instance.chat.completions.create.return_value = Chunks()
+        charged = []
+
+        result = self.llm.generate([{"role": "user", "content": "hello"}],
+                                   limit=OutputLimit(max_lines=2),
+                                   on_usage=lambda p, c: charged.append((p, c)))
+
+        self.assertEqual(result, "Uno\nDos")
+        self.assertTrue(Chunks.closed)
+        self.assertEqual(Chunks.read, 2)
+        self.assertEqual(len(charged), 1)
+        metrics = self.llm.metrics()
+        self.assertEqual(metrics["total_calls"], 1)
+        self.assertEqual(metrics["truncated_max_lines"], 1)
+        self.assertEqual(metrics["truncated_rate"], 1.0)
+        self.assertEqual(metrics["truncated_chars"], 1)
+        self.assertEqual(metrics["truncated_tokens_saved"], self.llm.max_tokens - 2)
+
+    """
+    With stop patterns, lines held back for checking are still sent when
+    the answer ends within the limit.
+    """
+    def test_output_limit_flushes_held_text(self):
+        def chunk(text):
+            return MagicMock(choices=[MagicMock(delta=MagicMock(content=text))], x_groq=None)
+
+        self.mock_groq_instance.chat.completions.create.return_value = iter(
+            [chunk("Uno"), chunk("\nDos")]
+        )
+
+        result = list(self.llm.stream([{"role": "user", "content": "hello"}],
+                                      limit=OutputLimit(max_lines=5, stop=("¿Quieres",))))
+
+        self.assertEqual("".join(result), "Uno\nDos")
+        self.assertEqual(self.llm.metrics()["total_truncated"], 0)
+
+    """
+    Against the real Groq SDK (HTTP stubbed with httpx.MockTransport): a
+    cancelled generate() closes the open response and returns right away
+    instead of waiting for the model to finish.
+    """
+    def test_cancel_closes_http_response(self):
+        self.groq_patcher.stop()
+        from groq import Groq as RealGroq
+        released = threading.Event()
+
+        class SlowBody(httpx.SyncByteStream):
+            def __iter__(self):
+                yield (b'data: {"id": "1", "object": "chat.completion.chunk", "created": 0, '
+                       b'"model": "m", "choices": [{"index": 0, "delta": {"content": "Hola"}}]}\n\n')
+                released.wait(5)    # the model keeps "generating"
+
+            def close(self):
+                released.set()
+
+        def handler(request):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                                  stream=SlowBody())
+
+        self.llm.client = RealGroq(api_key="fake_key", max_retries=0,
+                                   http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+        cancel = CancelToken()
+        threading.Timer(0.1, cancel.cancel, args=("disconnected",)).start()
+
+        start = time.monotonic()
+        result = self.llm.generate([{"role": "user", "content": "hello"}], cancel=cancel)
+
+        self.assertIsNone(result)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertTrue(released.is_set())
+        self.assertEqual(self.llm.metrics()["cancelled_disconnected"], 1)
+        self.groq_patcher.start()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,98 @@
+# tests/test_output.py
+"""
+Tests for the incremental output-shape checker (core/output.py).
+"""
+
+import unittest
+
+from core.output import OutputLimit
+from core.prompting import OUTPUT_LIMITS
+
+
+def run(limit, deltas):
+    checker = limit.checker()
+    kept = "".join(checker.feed(delta) for delta in deltas)
+    return kept, checker
+
+
+class TestOutputChecker(unittest.TestCase):
+
+    #The cut happens at the end of the last allowed line, blank lines don't count
+    def test_max_lines(self):
+        kept, checker = run(OutputLimit(max_lines=2),
+                            ["Uno\n", "\nDos", "\nTres\nCua", "tro"])
+        self.assertEqual(kept, "Uno\n\nDos")
+        self.assertTrue(checker.done)
+        self.assertEqual(checker.reason, "max_lines")
+        self.assertEqual(checker.dropped_chars, len("\nTres\nCuatro"))
+
+    #A "." is a sentence end only once the next delta confirms the whitespace
+    def test_max_sentences_across_deltas(self):
+        kept, checker = run(OutputLimit(max_sentences=1),
+                            ["Listo, recordatorio creado", ".", " ¿Algo", " más?"])
+        self.assertEqual(kept, "Listo, recordatorio creado.")
+        self.assertEqual(checker.reason, "max_sentences")
+
+    #Abbreviations, initials and list numbers don't end a sentence
+    def test_abbreviations_and_numbered_lists(self):
+        limit = OutputLimit(max_sentences=3)
+        for text in ("Recordatorio creado para el 5 de dic. a las 10 a. m. con el Dr. Pérez.",
+                     "Nota guardada: 1. Comprar pan. 2. Llamar a Ana. 3. Pagar la luz.",
+                     "Cita con la Sra. López el 3 de feb. Llevar documentos etc. Listo."):
+            kept, checker = run(limit, [text[i:i + 7] for i in range(0, len(text), 7)])
+            self.assertEqual(kept + checker.flush(), text)
+            self.assertFalse(checker.done, text)
+
+    #Only a terminator followed by a new sentence counts
+    def test_sentences_need_a_next_sentence(self):
+        kept, checker = run(OutputLimit(max_sentences=2),
+                            ["Hecho. Recordatorio ", "guardado. Te aviso ", "el lunes."])
+        self.assertEqual(kept, "Hecho. Recordatorio guardado.")
+        self.assertTrue(checker.done)
+
+    #The kept text is the same however the answer is split into deltas
+    def test_cut_independent_of_chunking(self):
+        text = "Listo, recordatorio creado. «Comprar pan» el lunes. ¿Algo más?"
+        splits = [[text], list(text)]
+        splits += [[text[:i], text[i:]] for i in range(1, len(text))]
+        splits += [[text[i:i + n] for i in range(0, len(text), n)] for n in (2, 3, 5, 8)]
+        for limit, expected in ((OutputLimit(max_sentences=1), "Listo, recordatorio creado."),
+                                (OUTPUT_LIMITS["SP_REMINDER"], "Listo, recordatorio creado.")):
+            for deltas in splits:
+                kept, checker = run(limit, deltas)
+                self.assertEqual(kept + checker.flush(), expected, deltas)
+                self.assertEqual(checker.dropped_chars, len(text) - len(expected), deltas)
+
+    def test_decimal_point_is_not_a_sentence(self):
+        kept, checker = run(OutputLimit(max_sentences=1), ["Cuesta 3.5 euros"])
+        self.assertEqual(kept, "Cuesta 3.5 euros")
+        self.assertFalse(checker.done)
+
+    #A new line is held back until a stop pattern split across deltas can be checked
+    def test_stop_pattern(self):
+        checker = OutputLimit(stop=(r"\s*¿Quieres",)).checker()
+        self.assertEqual(checker.feed("París es la capital."), "París es la capital.")
+        self.assertEqual(checker.feed("\n\n¿Qui"), "")
+        self.assertEqual(checker.feed("eres saber más?"), "")
+        self.assertEqual(checker.text, "París es la capital.")
+        self.assertEqual(checker.reason, "stop")
+
+    #Held-back lines that don't match are sent on the next newline or at the end
+    def test_stop_pattern_flush(self):
+        checker = OutputLimit(stop=(r"¿Quieres",)).checker()
+        self.assertEqual(checker.feed("Uno\nDos"), "Uno")
+        self.assertEqual(checker.feed("\nTres"), "\nDos")
+        self.assertEqual(checker.flush(), "\nTres")
+        self.assertFalse(checker.done)
+
+    #Answers within the limit pass through untouched
+    def test_within_limit(self):
+        text = "Dato 1\nDato 2\nDato 3"
+        kept, checker = run(OUTPUT_LIMITS["SP_SEARCH"], [text[:5], text[5:]])
+        self.assertEqual(kept + checker.flush(), text)
+        self.assertFalse(checker.done)
+        self.assertEqual(checker.dropped_chars, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
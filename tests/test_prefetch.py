@@ -0,0 +1,108 @@
+# tests/test_prefetch.py
+"""
+Tests for the speculative prefetch of suggested commands.
+The LLM is a fake client so the tests run offline.
+"""
+
+import io
+import threading
+import time
+import unittest
+
+from core.conversation import ConversationManager
+from services.cancel import CancelToken
+from services.chat import run_turn
+from services.prefetch import Prefetcher, messages_match
+from services.telemetry import JSONLogger
+
+
+class FakeLLM:
+    max_tokens = 100
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, messages, on_usage=None, **kwargs):
+        self.calls.append(messages)
+        if on_usage is not None:
+            on_usage(10, 5)
+        return "nota guardada"
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self.llm = FakeLLM()
+        self.prefetcher = Prefetcher()
+        self.logger = JSONLogger(stream=io.StringIO())
+        self.conv = ConversationManager()
+
+    def turn(self, text):
+        span = self.logger.span("r")
+        result = run_turn(self.conv, text, span, lambda: self.llm, prefetcher=self.prefetcher)
+        span.end()
+        return result
+
+    #Validates the suggested command is served from the speculative call
+    def test_hit_after_suggestion(self):
+        intent, _ = self.turn("apúntame esto por favor")
+        self.assertEqual(intent, "SUGGESTION")
+        self.assertEqual(self.prefetcher.started, 1)
+
+        intent, output = self.turn("/nota apúntame  esto por favor")
+        self.assertEqual(intent, "NOTE")
+        self.assertIn("nota guardada", output)
+        self.assertEqual(len(self.llm.calls), 1)     #no second call
+        self.assertEqual(self.prefetcher.hits, 1)
+        self.assertEqual(self.conv.tokens_used, 15)  #speculative tokens charged
+
+    #Validates a different next turn wastes the speculation and calls the LLM
+    def test_miss_is_wasted(self):
+        self.turn("apúntame esto por favor")
+        self.prefetcher._entries[self.conv.session_id].future.result()
+        self.turn("/busqueda otra cosa")
+
+        metrics = self.prefetcher.metrics()
+        self.assertEqual(metrics["prefetch_misses"], 1)
+        self.assertEqual(metrics["prefetch_wasted_calls"], 1)
+        self.assertEqual(metrics["prefetch_wasted_tokens"], 15)
+        self.assertEqual(len(self.llm.calls), 2)
+        self.assertEqual(self.conv.tokens_used, 15)   #only the real call is charged
+
+    #Validates speculative calls stop at the in-flight cap
+    def test_inflight_cap(self):
+        prefetcher = Prefetcher(max_inflight=1)
+        release = threading.Event()
+        messages = [{"role": "user", "content": "x"}]
+
+        self.assertTrue(prefetcher.start("a", messages, lambda on_usage, cancel: release.wait()))
+        self.assertFalse(prefetcher.start("b", messages, lambda on_usage, cancel: "y"))
+        self.assertEqual(prefetcher.skipped_budget, 1)
+        release.set()
+
+    #Validates a cancelled turn stops waiting for the speculation and leaves it for the next turn
+    def test_take_cancelled(self):
+        release = threading.Event()
+        messages = [{"role": "user", "content": "x"}]
+        self.prefetcher.start("a", messages, lambda on_usage, cancel: release.wait(5) and "y")
+        cancel = CancelToken()
+        threading.Timer(0.05, cancel.cancel, args=("superseded",)).start()
+
+        started = time.monotonic()
+        self.assertIsNone(self.prefetcher.take("a", messages, cancel))
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.prefetcher.misses, 0)
+
+        release.set()
+        self.assertEqual(self.prefetcher.take("a", messages, CancelToken()), ("y", (0, 0)))
+
+    #Validates matching ignores case and whitespace of the last message only
+    def test_messages_match(self):
+        system = {"role": "system", "content": "S"}
+        a = [system, {"role": "user", "content": "/nota Hola  mundo"}]
+        self.assertTrue(messages_match(a, [system, {"role": "user", "content": "/nota hola mundo"}]))
+        self.assertFalse(messages_match(a, [{"role": "system", "content": "T"}, a[1]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# tests/test_profiling.py
+
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from services.profiling import ProfileRing, RequestProfiler, SamplingProfiler
+from services.telemetry import JSONLogger
+
+
+def busy_wait(secs):
+    end = time.perf_counter() + secs
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    #Validates a slow request is captured with its stage breakdown
+    def test_slow_request_captured(self):
+        stream = io.StringIO()
+        profiler = RequestProfiler(threshold_ms=20, ring=ProfileRing(self.tmp.name))
+        logger = JSONLogger(stream=stream, profiler=profiler)
+
+        fast = logger.span("fast")
+        fast.end()
+        slow = logger.span("slow")
+        with slow.stage("generate"):
+            time.sleep(0.03)
+        slow.end(intent="DEFAULT")
+        logger.flush()
+
+        files = profiler.ring.files()
+        self.assertEqual(len(files), 1)
+        with open(files[0], encoding="utf-8") as f:
+            record = json.load(f)
+        self.assertEqual(record["request_id"], "slow")
+        self.assertIn("generate", record["stages"])
+        self.assertEqual(record["fields"]["intent"], "DEFAULT")
+
+        events = [json.loads(line)["event"] for line in stream.getvalue().splitlines()]
+        self.assertEqual(events.count("slow_request"), 1)
+        logger.close()
+
+    #Validates the ring never keeps more than max_files captures
+    def test_ring_is_bounded(self):
+        ring = ProfileRing(self.tmp.name, max_files=3)
+        for i in range(7):
+            ring.write({"request_id": str(i)})
+        self.assertEqual(len(ring.files()), 3)
+        ids = []
+        for path in ring.files():
+            with open(path, encoding="utf-8") as f:
+                ids.append(json.load(f)["request_id"])
+        self.assertEqual(ids, ["4", "5", "6"])
+
+    #Validates workers sharing a directory keep each other's captures
+    def test_ring_shared_by_workers(self):
+        first = ProfileRing(self.tmp.name, max_files=1001)
+        second = ProfileRing(self.tmp.name, max_files=1001)
+        paths = [ring.write({"request_id": str(i)})
+                 for i in range(600) for ring in (first, second)]
+        self.assertEqual(len(set(paths)), 1200)
+        self.assertEqual(second.files(), paths[-1001:])
+        self.assertIn(str(os.getpid()), os.path.basename(paths[-1]))
+
+    #Validates the sampler records the tracked thread's stacks
+    def test_sampler_collects_stacks(self):
+        sampler = SamplingProfiler(interval_ms=1)
+        with sampler.track() as samples:
+            busy_wait(0.05)
+        self.assertGreater(sum(samples.values()), 0)
+        self.assertTrue(any("busy_wait" in stack for stack in samples))
+
+
+if __name__ == "__main__":
+    unittest.main()
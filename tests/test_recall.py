@@ -0,0 +1,65 @@
+# tests/test_recall.py
+
+import unittest
+from core.conversation import ConversationManager
+from core.prompting import build_messages
+from core.recall import RecallIndex, tokenize
+
+
+class TestRecall(unittest.TestCase):
+
+    def filled_index(self):
+        index = RecallIndex()
+        index.add("mi perro se llama Toby", "¡Qué buen nombre para un perro!")
+        index.add("¿cuál es la capital de Francia?", "La capital de Francia es París.")
+        index.add("/nota comprar leche y pan", "Nota guardada: comprar leche y pan.", "note")
+        return index
+
+    #Validates tokens are accent-free and stopwords are dropped
+    def test_tokenize(self):
+        self.assertEqual(tokenize("¿Cuál es la canción de Ramón?"), ["cual", "cancion", "ramon"])
+
+    #Validates the most relevant exchange ranks first
+    def test_search_ranks_relevant(self):
+        hits = self.filled_index().search("¿cómo se llamaba mi perro?", k=2)
+        self.assertIn("Toby", hits[0][2])
+        self.assertEqual(self.filled_index().search("astronomía"), [])
+
+    #Validates exchanges still in the window (seq >= before) are skipped
+    def test_search_before(self):
+        index = self.filled_index()
+        self.assertEqual(index.search("capital Francia", before=1), [])
+        self.assertEqual(len(index.search("capital Francia", before=2)), 1)
+
+    #Validates the cap drops old turns but keeps notes
+    def test_max_docs_keeps_notes(self):
+        index = RecallIndex(max_docs=3)
+        index.add("/nota cumpleaños de Ana el 3 de mayo", "Nota guardada.", "note")
+        for i in range(10):
+            index.add(f"pregunta {i}", f"respuesta {i}")
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.search("cumpleaños Ana")[0][1], "note")
+        self.assertEqual([user for _, user, _ in index.to_list()[1:]], ["pregunta 8", "pregunta 9"])
+
+    #Validates turns older than the window are recalled into the prompt
+    def test_conversation_recall(self):
+        cm = ConversationManager()
+        cm.update_state("mi perro se llama Toby", "¡Qué buen nombre!")
+        for i in range(cm.context_window):
+            cm.update_state(f"cuéntame algo del tema {i}", f"tema {i}")
+
+        history = cm.history.snapshot()
+        messages = build_messages("SP_DEFAULT", history, "¿cómo se llama mi perro?", cm.recall)
+        self.assertEqual(len(messages), len(history) + 3)
+        self.assertIn("Toby", messages[1]["content"])
+
+        #Nothing recalled while the exchange is still in the history
+        recent = build_messages("SP_DEFAULT", history, "tema 4", cm.recall)
+        self.assertEqual(len(recent), len(history) + 2)
+
+        restored = ConversationManager.from_dict(cm.to_dict())
+        self.assertEqual(restored.recall.to_list(), cm.recall.to_list())
+
+
+if __name__ == "__main__":
+    unittest.main()
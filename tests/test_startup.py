@@ -0,0 +1,50 @@
+# tests/test_startup.py
+"""
+Import-time guarantees: core must not pull in the web stack or the Groq SDK,
+and the app module must import without GROQ_API_KEY.
+Each check runs in a fresh interpreter so earlier imports don't leak in.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code: str):
+    env = dict(os.environ)
+    env.pop("GROQ_API_KEY", None)
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+
+
+class TestStartup(unittest.TestCase):
+
+    #core stays importable without Gradio / Groq
+    def test_core_has_no_heavy_imports(self):
+        proc = run(
+            "import sys, core.conversation, core.prompting, core.history\n"
+            "heavy = [m for m in ('gradio', 'groq', 'httpx') if m in sys.modules]\n"
+            "assert not heavy, heavy\n"
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+
+    #The Groq SDK is only imported when a client is constructed
+    def test_llm_module_is_lazy(self):
+        proc = run("import sys, services.llm\nassert 'groq' not in sys.modules\n")
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+
+    #Importing the app neither builds the UI nor requires an API key
+    def test_app_import_without_key(self):
+        proc = run(
+            "import sys, app.app, services.chat as chat\n"
+            "assert 'gradio' not in sys.modules\n"
+            "assert chat._llm is None\n"
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
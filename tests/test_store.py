@@ -0,0 +1,191 @@
+# tests/test_store.py
+"""
+Tests for the SQLite shared state. Two store/collector instances on the same
+file stand in for two worker processes.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from services.store import SessionBusy, SQLiteMetricsCollector, SQLiteSessionStore
+
+
+class TestSQLiteSessionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    #A session written by one worker is resumed by another
+    def test_shared_between_workers(self):
+        worker_a = SQLiteSessionStore(self.path)
+        worker_b = SQLiteSessionStore(self.path)
+
+        session_id = worker_a.create()
+        with worker_a.session(session_id) as conv:
+            conv.update_state("Me llamo Marisol", "Hola Marisol")
+
+        self.assertTrue(worker_b.exists(session_id))
+        with worker_b.session(session_id) as conv:
+            self.assertEqual(conv.turn_count, 1)
+            self.assertEqual(conv.history[0]["content"], "Me llamo Marisol")
+
+    #Concurrent turns on one session are serialized by the lease
+    def test_lease_serializes_turns(self):
+        store = SQLiteSessionStore(self.path)
+        session_id = store.create()
+
+        def turn(i):
+            with SQLiteSessionStore(self.path).session(session_id) as conv:
+                conv.update_state(f"u{i}", f"a{i}")
+
+        threads = [threading.Thread(target=turn, args=(i,)) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        with store.session(session_id) as conv:
+            self.assertEqual(conv.turn_count, 5)
+
+    #A turn longer than the lease keeps renewing it, so no other worker takes the session
+    def test_lease_renewed_during_turn(self):
+        store = SQLiteSessionStore(self.path, lease_secs=0.3)
+        session_id = store.create()
+        started = threading.Event()
+
+        def turn():
+            with store.session(session_id) as conv:
+                started.set()
+                time.sleep(0.8)
+                conv.update_state("hola", "hola")
+
+        worker = threading.Thread(target=turn)
+        worker.start()
+        started.wait()
+        with self.assertRaises(SessionBusy):
+            with SQLiteSessionStore(self.path, lease_secs=0.3).session(session_id):
+                pass
+        worker.join()
+
+        with store.session(session_id) as conv:
+            self.assertEqual(conv.turn_count, 1)
+
+    #A turn whose lease was taken over stores neither its state nor its recall rows
+    def test_lost_lease_not_saved(self):
+        store = SQLiteSessionStore(self.path)
+        session_id = store.create()
+        with self.assertRaises(SessionBusy):
+            with store.session(session_id) as conv:
+                conv.update_state("hola", "hola")
+                with sqlite3.connect(self.path) as other:
+                    other.execute("UPDATE sessions SET lease_owner = 'other', lease_until = 0")
+
+        with store.session(session_id) as conv:
+            self.assertEqual(conv.turn_count, 0)
+            self.assertEqual(len(conv.recall), 0)
+        with sqlite3.connect(self.path) as db:
+            (rows,) = db.execute("SELECT COUNT(*) FROM recall_docs").fetchone()
+        self.assertEqual(rows, 0)
+
+    def test_delete(self):
+        store = SQLiteSessionStore(self.path)
+        session_id = store.create()
+
+        self.assertTrue(store.delete(session_id))
+        self.assertFalse(store.exists(session_id))
+
+    #Recall documents are stored once, outside the session JSON, and other
+    #workers top up their index with only the rows they are missing
+    def test_recall_shared_and_incremental(self):
+        worker_a = SQLiteSessionStore(self.path)
+        worker_b = SQLiteSessionStore(self.path)
+        session_id = worker_a.create()
+
+        with worker_a.session(session_id) as conv:
+            conv.update_state("/nota mi perro se llama Toby", "Nota guardada")
+        with worker_b.session(session_id) as conv:
+            conv.update_state("¿qué clima hace?", "Soleado")
+            self.assertEqual(conv.recall.search("perro")[0][2], "/nota mi perro se llama Toby")
+        with worker_a.session(session_id) as conv:
+            self.assertEqual(len(conv.recall), 2)
+            self.assertEqual(conv.recall.search("clima")[0][3], "Soleado")
+
+        conn = worker_a._conn()
+        (state,) = conn.execute("SELECT state FROM sessions WHERE id = ?",
+                                (session_id,)).fetchone()
+        self.assertNotIn("recall", json.loads(state))
+        (rows,) = conn.execute("SELECT COUNT(*) FROM recall_docs").fetchone()
+        self.assertEqual(rows, 2)
+
+        worker_a.delete(session_id)
+        (rows,) = conn.execute("SELECT COUNT(*) FROM recall_docs").fetchone()
+        self.assertEqual(rows, 0)
+
+    #A turn that fails is not stored, and its exchange doesn't stay in the cached index
+    def test_recall_failed_turn(self):
+        store = SQLiteSessionStore(self.path)
+        session_id = store.create()
+        with self.assertRaises(RuntimeError):
+            with store.session(session_id) as conv:
+                conv.update_state("hola", "hola")
+                raise RuntimeError("boom")
+
+        with store.session(session_id) as conv:
+            self.assertEqual(len(conv.recall), 0)
+
+
+class TestSQLiteMetricsCollector(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    #Counters are summed and latencies merged across workers
+    def test_aggregate(self):
+        a = SQLiteMetricsCollector(self.path, lambda: {"total_calls": 2, "latencies": [0.1, 0.3]},
+                                   worker_id="a")
+        b = SQLiteMetricsCollector(self.path, lambda: {"total_calls": 3, "latencies": [0.2]},
+                                   worker_id="b")
+        a.publish()
+        b.publish()
+        a.publish()  # upsert, not a second row
+
+        totals = b.aggregate()
+        self.assertEqual(totals["workers"], 2)
+        self.assertEqual(totals["total_calls"], 5)
+        self.assertEqual(totals["avg_latency_ms"], 200.0)
+
+    #Stopped and dead workers don't count; a restart clears its old row
+    def test_stale_and_stopped_workers(self):
+        source = lambda: {"total_calls": 1}
+        live = SQLiteMetricsCollector(self.path, source, worker_id="live", interval_secs=60)
+        stopped = SQLiteMetricsCollector(self.path, source, worker_id="stopped", interval_secs=60)
+        live.publish()
+        stopped.publish()
+        live._conn().execute(
+            "INSERT INTO worker_metrics (worker_id, snapshot, updated_at) VALUES (?, ?, ?)",
+            ("dead", '{"total_calls": 7}', 0.0),
+        )
+
+        stopped.start()
+        stopped.stop()
+        totals = live.aggregate()
+        self.assertEqual(totals["workers"], 1)
+        self.assertEqual(totals["total_calls"], 1)
+        (rows,) = live._conn().execute("SELECT COUNT(*) FROM worker_metrics").fetchone()
+        self.assertEqual(rows, 1)    # the dead row was purged by start()
+
+
+if __name__ == "__main__":
+    unittest.main()
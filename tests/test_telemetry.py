@@ -0,0 +1,84 @@
+# tests/test_telemetry.py
+
+import io
+import json
+import unittest
+from services.telemetry import JSONLogger
+
+class TestTelemetry(unittest.TestCase):
+
+    def read_records(self, stream):
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    #Validates records are written as JSON lines by the background thread
+    def test_json_lines(self):
+        stream = io.StringIO()
+        logger = JSONLogger(stream=stream)
+        logger.log("intent", "abc123", intent="NOTE")
+        logger.flush()
+
+        records = self.read_records(stream)
+        self.assertEqual(records[0]["event"], "intent")
+        self.assertEqual(records[0]["req"], "abc123")
+        self.assertEqual(records[0]["intent"], "NOTE")
+        logger.close()
+
+    #Validates a span emits one record with every stage duration
+    def test_span_stages(self):
+        stream = io.StringIO()
+        logger = JSONLogger(stream=stream)
+        span = logger.span("req1")
+        with span.stage("pipeline"):
+            pass
+        with span.stage("llm"):
+            pass
+        span.end(intent="DEFAULT")
+        logger.flush()
+
+        record = self.read_records(stream)[-1]
+        self.assertEqual(record["event"], "request")
+        self.assertIn("pipeline", record["stages"])
+        self.assertIn("llm", record["stages"])
+        self.assertGreaterEqual(record["total_ms"], 0)
+        logger.close()
+
+    #Validates sampling drops info records but keeps warnings
+    def test_sampling_keeps_warnings(self):
+        stream = io.StringIO()
+        logger = JSONLogger(stream=stream, sample_rate=0.0)
+        logger.log("intent", "r1")
+        logger.log("fallback", "r1", level="warning")
+        logger.flush()
+
+        records = self.read_records(stream)
+        self.assertEqual([r["event"] for r in records], ["fallback"])
+        self.assertEqual(logger.stats()["sampled_out"], 1)
+        logger.close()
+
+    #Validates long fields are capped
+    def test_field_cap(self):
+        stream = io.StringIO()
+        logger = JSONLogger(stream=stream, max_field_chars=10)
+        logger.log("x", "r1", text="a" * 50)
+        logger.flush()
+
+        self.assertTrue(self.read_records(stream)[0]["text"].startswith("a" * 10 + "..."))
+        logger.close()
+
+    #Validates a record that can't be serialized is dropped without stopping the writer
+    def test_bad_record_dropped(self):
+        stream = io.StringIO()
+        logger = JSONLogger(stream=stream)
+        logger.log("bad", "r1", stages={("not", "a", "str"): 1})
+        logger.flush()
+        logger.log("good", "r2")
+        logger.flush()
+
+        self.assertEqual([r["event"] for r in self.read_records(stream)], ["good"])
+        self.assertEqual(logger.stats()["dropped"], 1)
+        self.assertEqual(logger.stats()["emitted"], 1)
+        logger.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# tests/test_usage.py
+"""
+Tests for token/cost accounting and per-session budgets.
+"""
+
+import io
+import unittest
+from unittest.mock import MagicMock
+from core.conversation import ConversationManager
+from services.chat import BUDGET_OUTPUT, run_turn
+from services.telemetry import JSONLogger
+from services.usage import UsageLedger
+
+
+class TestUsageLedger(unittest.TestCase):
+
+    #Validates prompt/completion split, cost and per-key breakdowns
+    def test_record(self):
+        ledger = UsageLedger(prices={"m": (1.0, 2.0)})
+        ledger.record("m", 1000, 500, intent="NOTE", session_id="s1", history_len=0)
+        ledger.record("m", 3000, 500, intent="NOTE", session_id="s1", history_len=4, trimmed=2)
+
+        report = ledger.report()
+        self.assertEqual(report["by_intent"]["NOTE"]["prompt_tokens"], 4000)
+        self.assertEqual(report["by_model"]["m"]["completion_tokens"], 1000)
+        self.assertAlmostEqual(ledger.session_usage("s1")["cost_usd"], 0.006)
+
+        growth = report["prompt_growth"]
+        self.assertEqual(growth["avg_prompt_tokens_by_history_len"], {0: 1000.0, 4: 3000.0})
+        self.assertEqual(growth["tokens_per_history_message"], 500.0)
+        self.assertEqual(growth["trimming_saved_tokens_est"], 1000)
+
+
+class TestSessionBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.llm = MagicMock()
+        self.llm.max_tokens = 300
+        self.llm.usage = UsageLedger(prices={})
+        self.llm.generate.return_value = "respuesta OK"
+        self.span = JSONLogger(stream=io.StringIO()).span("test")
+
+    #Under budget: the model is called and usage is charged to the session
+    def test_within_budget(self):
+        cm = ConversationManager()
+        _, output = run_turn(cm, "Hola", self.span, lambda: self.llm, token_budget=10000)
+
+        self.assertTrue(output.endswith("respuesta OK"))
+        kwargs = self.llm.generate.call_args.kwargs
+        self.assertEqual(kwargs["session_id"], cm.session_id)
+        kwargs["on_usage"](120, 30)
+        self.assertEqual(cm.tokens_used, 150)
+
+    #Over budget: refused before calling Groq
+    def test_over_budget(self):
+        cm = ConversationManager()
+        cm.add_usage(9800, 0)
+
+        _, output = run_turn(cm, "Hola", self.span, lambda: self.llm, token_budget=10000)
+
+        self.assertTrue(output.endswith(BUDGET_OUTPUT))
+        self.llm.generate.assert_not_called()
+        self.assertEqual(self.llm.usage.budget_blocked, 1)
+
+    #The streaming path goes through the same checks and sends the refusal as its only delta
+    def test_over_budget_streaming(self):
+        cm = ConversationManager()
+        cm.add_usage(9800, 0)
+        deltas, intents = [], []
+
+        _, output = run_turn(cm, "Hola", self.span, lambda: self.llm, token_budget=10000,
+                             on_delta=deltas.append, on_intent=intents.append)
+
+        self.assertTrue(output.endswith(BUDGET_OUTPUT))
+        self.assertEqual(deltas, [BUDGET_OUTPUT])
+        self.assertEqual(intents, ["DEFAULT"])
+        self.llm.stream.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()